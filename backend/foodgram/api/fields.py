@@ -0,0 +1,114 @@
+import base64
+import binascii
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+# Размер куска base64-строки, декодируемого за раз (кратен четырем).
+DECODE_CHUNK_SIZE = 64 * 1024
+
+
+class RecipeImageField(Base64ImageField):
+    """Изображение рецепта в base64.
+
+    Строка декодируется кусками во временный файл, поэтому в памяти не
+    держится вторая копия изображения, а хранилище на диске переносит
+    файл без копирования. При чтении отдается уменьшенная копия variant,
+    пока ее нет - исходное изображение.
+    """
+
+    def __init__(self, *args, variant=None, **kwargs):
+        self.variant = variant
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        content_type = None
+        header, separator, data = base64_data.partition(';base64,')
+        if separator:
+            content_type = header.replace('data:', '')
+        else:
+            data = header
+        upload = TemporaryUploadedFile(
+            str(uuid.uuid4()), content_type, 0, None)
+        try:
+            for start in range(0, len(data), DECODE_CHUNK_SIZE):
+                upload.write(base64.b64decode(
+                    data[start:start + DECODE_CHUNK_SIZE], validate=True))
+        except (binascii.Error, ValueError):
+            upload.close()
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        upload.size = upload.tell()
+        upload.seek(0)
+        try:
+            with Image.open(upload) as image:
+                extension = (image.format or '').lower()
+        except (OSError, Image.DecompressionBombError):
+            extension = None
+        if extension not in self.ALLOWED_TYPES:
+            upload.close()
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        upload.seek(0)
+        upload.name = f'{upload.name}.{extension}'
+        return super(Base64FieldMixin, self).to_internal_value(upload)
+
+    def to_representation(self, file):
+        if self.variant and file:
+            file = getattr(file.instance, self.variant, None) or file
+        return super().to_representation(file)
+
+
+def resolve_pks(queryset, pks):
+    """Объекты по списку первичных ключей одним запросом IN.
+
+    Возвращает объекты в порядке ключей и список отсутствующих ключей.
+    """
+    found = queryset.in_bulk(set(pks))
+    missing = sorted({pk for pk in pks if pk not in found})
+    return [found[pk] for pk in pks if pk in found], missing
+
+
+class BulkPrimaryKeyRelatedField(serializers.ManyRelatedField):
+    """Список первичных ключей, объекты выбираются одним запросом.
+
+    Все отсутствующие ключи перечисляются в одной ошибке.
+    """
+    default_error_messages = {
+        **serializers.ManyRelatedField.default_error_messages,
+        'does_not_exist': 'Не найдены объекты с id: {pk_value}.',
+        'incorrect_type': 'Некорректный тип id: {data_type}.',
+    }
+
+    def __init__(self, queryset, **kwargs):
+        super().__init__(
+            child_relation=serializers.PrimaryKeyRelatedField(
+                queryset=queryset),
+            **kwargs
+        )
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        pks = []
+        for pk in data:
+            if isinstance(pk, bool) or not isinstance(pk, (int, str)):
+                self.fail('incorrect_type', data_type=type(pk).__name__)
+            try:
+                pks.append(int(pk))
+            except ValueError:
+                self.fail('incorrect_type', data_type=type(pk).__name__)
+        objects, missing = resolve_pks(
+            self.child_relation.get_queryset(), pks)
+        if missing:
+            self.fail('does_not_exist',
+                      pk_value=', '.join(map(str, missing)))
+        return objects
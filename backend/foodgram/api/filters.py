@@ -1,47 +1,50 @@
+from django.db.models import Exists, OuterRef
+from recipes.models import Favorite, Recipe, ShoppingCard
+from recipes.search import search_recipes
 from rest_framework import filters
 
 
-class TagsSlugFilter(filters.BaseFilterBackend):
-    """Фильтр по тегам."""
-    def filter_queryset(self, request, queryset, view):
-        tags = request.query_params.getlist('tags')
-        if tags:
-            return queryset.filter(tags__slug__in=tags).distinct()
-        return queryset
-
-
-class IngredientFilter(filters.SearchFilter):
-    search_param = 'name'
+class RecipeFilter(filters.BaseFilterBackend):
+    """Фильтр рецептов по автору, тегам, избранному и корзине.
 
+    Связанные таблицы проверяются полусоединениями, поэтому строки
+    рецептов не размножаются и DISTINCT не нужен: теги через EXISTS,
+    избранное и корзина, которые у пользователя невелики, через pk IN.
+    """
+    relation_params = (
+        ('is_favorited', Favorite),
+        ('is_in_shopping_cart', ShoppingCard),
+    )
 
-class AuthorIdFilter(filters.BaseFilterBackend):
-    """Фильтр по автору."""
     def filter_queryset(self, request, queryset, view):
-        author = request.GET.get('author')
+        params = request.query_params
+        author = params.get('author')
         if author:
-            return queryset.filter(author=author)
+            queryset = queryset.filter(author=author)
+        tags = params.getlist('tags')
+        if tags:
+            queryset = queryset.annotate(has_tags=Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'), tag__slug__in=tags)
+            )).filter(has_tags=True)
+        for param, model in self.relation_params:
+            if params.get(param) != '1':
+                continue
+            if request.user.is_anonymous:
+                return queryset.none()
+            queryset = queryset.filter(
+                pk__in=model.objects.filter(
+                    user=request.user).values('recipe_id')
+            )
         return queryset
 
 
-class IsFavoritedFilter(filters.BaseFilterBackend):
-    """Фильтрация по избранным рецептам."""
-    def filter_queryset(self, request, queryset, view):
-        is_favorited = request.GET.get('is_favorited')
-        user = request.user
-        if is_favorited != '1':
-            return queryset
-        if user.is_authenticated:
-            return queryset.filter(favorites__user=user)
-        return None
-
+class RecipeSearchFilter(filters.BaseFilterBackend):
+    """Полнотекстовый поиск рецептов, выдача упорядочена по релевантности."""
+    search_param = 'search'
 
-class IsInShoppingCartFilter(filters.BaseFilterBackend):
-    """Фильтр по рецептам в карте покупок."""
     def filter_queryset(self, request, queryset, view):
-        is_in_shopping_cart = request.GET.get('is_in_shopping_cart')
-        user = request.user
-        if is_in_shopping_cart != '1':
-            return queryset
-        if user.is_authenticated:
-            return queryset.filter(purchase__user=user)
-        return None
+        query = request.query_params.get(self.search_param)
+        if query:
+            return search_recipes(queryset, query)
+        return queryset
@@ -0,0 +1,97 @@
+import resource
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import Ingredient, ShoppingCartItem, User
+from rest_framework.test import APIClient
+
+from api.utils import drop_pdf_shopping_cart
+
+URL = '/api/recipes/download_shopping_cart/'
+FORMATS = ('pdf', 'txt', 'csv')
+
+
+class Command(BaseCommand):
+    help = ('Сравнение выгрузок списка покупок: время до первого байта, '
+            'полное время и пиковая память на большой корзине')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--items', type=int, default=100000,
+            help='Количество строк в списке покупок',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Количество записей в одной вставке',
+        )
+
+    def handle(self, *args, **options):
+        """Обработчик команды"""
+        if min(options['items'], options['batch_size']) < 1:
+            raise CommandError('Параметры должны быть больше нуля.')
+        # Данные создаются в транзакции и откатываются после замеров.
+        with transaction.atomic():
+            user = self.seed(options)
+            client = APIClient()
+            client.force_authenticate(user)
+            for export_format in FORMATS:
+                drop_pdf_shopping_cart(user.pk)
+                first_byte, total, size, peak = self.measure(
+                    client, export_format)
+                self.stdout.write(
+                    f'{export_format}: первый байт {first_byte:.0f} мс, '
+                    f'всего {total:.0f} мс, {size / 1024:.0f} КБ, '
+                    f'пик памяти Python {peak / 1024 / 1024:.1f} МБ'
+                )
+            transaction.set_rollback(True)
+        # ru_maxrss общий для процесса и только растет, поэтому пик
+        # каждого формата считается tracemalloc.
+        self.stdout.write(
+            'Пиковый RSS процесса: '
+            f'{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss} КБ')
+        self.stdout.write(self.style.SUCCESS('Данные удалены.'))
+
+    def measure(self, client, export_format):
+        """Время до первого байта и полное (мс), размер, пик памяти."""
+        tracemalloc.start()
+        try:
+            started = time.perf_counter()
+            response = client.get(URL, {'format': export_format})
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{export_format}: ответ {response.status_code}.')
+            chunks = iter(response.streaming_content)
+            size = len(next(chunks, b''))
+            first_byte = time.perf_counter() - started
+            for chunk in chunks:
+                size += len(chunk)
+            total = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return first_byte * 1000, total * 1000, size, peak
+
+    def seed(self, options):
+        """Пользователь со сводкой корзины из items ингредиентов."""
+        started = time.monotonic()
+        size = options['batch_size']
+        user = User.objects.create(username='bench-exports',
+                                   email='bench-exports@foodgram.ru')
+        for start in range(0, options['items'], size):
+            count = min(size, options['items'] - start)
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'bench-ингредиент {start + i}',
+                           measurement_unit='г')
+                for i in range(count)
+            )
+            ids = Ingredient.objects.order_by('-id').values_list(
+                'id', flat=True)[:count]
+            ShoppingCartItem.objects.bulk_create(
+                ShoppingCartItem(user=user, ingredient_id=pk, amount=pk % 900)
+                for pk in ids
+            )
+        self.stdout.write(
+            f'Данные созданы за {time.monotonic() - started:.1f} с.')
+        return user
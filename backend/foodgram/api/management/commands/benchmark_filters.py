@@ -0,0 +1,143 @@
+import random
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from recipes.models import Favorite, Recipe, ShoppingCard, Tag, User
+from rest_framework.request import Request
+
+from api.filters import RecipeFilter
+
+# Наборы параметров запроса, на которых сравниваются фильтры.
+QUERIES = (
+    'tags=bench-breakfast',
+    'tags=bench-breakfast&tags=bench-dinner',
+    'is_favorited=1',
+    'is_in_shopping_cart=1&tags=bench-lunch',
+    'is_favorited=1&is_in_shopping_cart=1'
+    '&tags=bench-breakfast&tags=bench-dinner',
+)
+TAGS = ('bench-breakfast', 'bench-lunch', 'bench-dinner')
+PAGE_SIZE = 6
+
+
+def join_filter(request, queryset):
+    """Прежняя фильтрация соединениями с DISTINCT."""
+    params = request.query_params
+    if params.get('is_favorited') == '1':
+        queryset = queryset.filter(favorites__user=request.user)
+    if params.get('is_in_shopping_cart') == '1':
+        queryset = queryset.filter(purchase__user=request.user)
+    tags = params.getlist('tags')
+    if tags:
+        queryset = queryset.filter(tags__slug__in=tags).distinct()
+    return queryset
+
+
+def exists_filter(request, queryset):
+    """Фильтрация полусоединениями без DISTINCT."""
+    return RecipeFilter().filter_queryset(request, queryset, None)
+
+
+class Command(BaseCommand):
+    help = ('Сравнение времени фильтрации рецептов соединениями '
+            'и полусоединениями на сгенерированных данных')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=100000,
+            help='Количество генерируемых рецептов',
+        )
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Количество генерируемых пользователей',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Количество записей в одной вставке',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Количество повторов каждого запроса',
+        )
+
+    def handle(self, *args, **options):
+        """Обработчик команды"""
+        if min(options['recipes'], options['users'], options['repeat'],
+               options['batch_size']) < 1:
+            raise CommandError('Параметры должны быть больше нуля.')
+        # Данные создаются в транзакции и откатываются после замеров.
+        with transaction.atomic():
+            user = self.seed(options)
+            for query in QUERIES:
+                request = Request(RequestFactory().get(f'/?{query}'))
+                request.user = user
+                join = self.measure(join_filter, request, options['repeat'])
+                exists = self.measure(
+                    exists_filter, request, options['repeat'])
+                self.stdout.write(
+                    f'{query}: JOIN+DISTINCT {join:.1f} мс, '
+                    f'полусоединения {exists:.1f} мс'
+                )
+            request = Request(RequestFactory().get('/?is_favorited=1'))
+            request.user = AnonymousUser()
+            if exists_filter(request, Recipe.objects.all()).exists():
+                raise CommandError('Аноним получил непустое избранное.')
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Данные удалены.'))
+
+    def measure(self, filter_func, request, repeat):
+        """Медианное время запроса количества и первой страницы, мс."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = filter_func(
+                request, Recipe.objects.for_read(request.user))
+            queryset.count()
+            list(queryset[:PAGE_SIZE])
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)[len(timings) // 2]
+
+    def seed(self, options):
+        """Генерация пользователей, тегов, рецептов и связей."""
+        started = time.monotonic()
+        size = options['batch_size']
+        User.objects.bulk_create(
+            User(username=f'bench{i}', email=f'bench{i}@foodgram.ru')
+            for i in range(options['users'])
+        )
+        Tag.objects.bulk_create(
+            Tag(name=slug, slug=slug, color='#E26C2D') for slug in TAGS)
+        tags = list(Tag.objects.filter(slug__in=TAGS))
+        users = list(User.objects.filter(username__startswith='bench'))
+        reader = users[0]
+        through = Recipe.tags.through
+        for start in range(0, options['recipes'], size):
+            count = min(size, options['recipes'] - start)
+            Recipe.objects.bulk_create(
+                Recipe(name=f'Рецепт {start + i}', text='Описание',
+                       cooking_time=10, image='recipes/bench.png',
+                       author=random.choice(users))
+                for i in range(count)
+            )
+            ids = Recipe.objects.order_by('-id').values_list(
+                'id', flat=True)[:count]
+            through.objects.bulk_create(
+                through(recipe_id=recipe_id, tag=tag)
+                for recipe_id in ids
+                for tag in random.sample(tags, random.randint(1, 2))
+            )
+            Favorite.objects.bulk_create(
+                Favorite(user=reader, recipe_id=recipe_id)
+                for recipe_id in ids if random.random() < 0.01
+            )
+            ShoppingCard.objects.bulk_create(
+                ShoppingCard(user=reader, recipe_id=recipe_id)
+                for recipe_id in ids if random.random() < 0.01
+            )
+            self.stdout.write(f'Создано рецептов: {start + count}')
+        self.stdout.write(
+            f'Данные созданы за {time.monotonic() - started:.1f} с.')
+        return reader
@@ -0,0 +1,89 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Маршруты чтения, на которых замеряется пропускная способность.
+PATHS = (
+    '/api/recipes/?limit=6',
+    '/api/recipes/?limit=6&page=2',
+    '/api/tags/',
+    f'/api/ingredients/?name={quote("с")}',
+    '/api/users/?limit=6',
+)
+
+
+def fetch(url, token):
+    """Время ответа в мс и код ответа (None, если сервер недоступен)."""
+    request = Request(url)
+    if token:
+        request.add_header('Authorization', f'Token {token}')
+    started = time.perf_counter()
+    try:
+        with urlopen(request, timeout=30) as response:
+            response.read()
+            code = response.status
+    except HTTPError as error:
+        code = error.code
+    except OSError:
+        code = None
+    return (time.perf_counter() - started) * 1000, code
+
+
+def percentile(values, share):
+    """Перцентиль отсортированного списка."""
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = ('Замер пропускной способности маршрутов чтения запущенного '
+            'сервера при одновременных соединениях')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000',
+            help='Адрес запущенного сервера',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 8, 32],
+            help='Количество одновременных соединений',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=500,
+            help='Количество запросов на каждый уровень',
+        )
+        parser.add_argument(
+            '--token', default=None,
+            help='Токен пользователя для авторизованных запросов',
+        )
+
+    def handle(self, *args, **options):
+        """Обработчик команды"""
+        if min(options['requests'], *options['concurrency']) < 1:
+            raise CommandError('Параметры должны быть больше нуля.')
+        base = options['url'].rstrip('/')
+        urls = [base + path for path in PATHS]
+        # Прогрев: кэши и соединения сервера.
+        for url in urls:
+            if fetch(url, options['token'])[1] is None:
+                raise CommandError(f'Сервер не отвечает на {url}.')
+        for concurrency in options['concurrency']:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(
+                    lambda i: fetch(urls[i % len(urls)], options['token']),
+                    range(options['requests'])
+                ))
+            elapsed = time.perf_counter() - started
+            timings = sorted(timing for timing, _ in results)
+            errors = sum(code is None or code >= 400 for _, code in results)
+            self.stdout.write(
+                f'Соединений {concurrency}: '
+                f'{len(results) / elapsed:.0f} запросов/с, '
+                f'p50 {percentile(timings, 0.5):.1f} мс, '
+                f'p95 {percentile(timings, 0.95):.1f} мс, '
+                f'ошибок {errors}'
+            )
@@ -0,0 +1,134 @@
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+from recipes.catalog import catalog_cache, get_catalog_version
+from rest_framework.response import Response
+
+from .relations import relations_state
+
+
+class ConditionalMixin:
+    """Условные GET-запросы: ETag, Last-Modified и ответ 304.
+
+    Валидаторы считаются одним агрегирующим запросом по полю updated_at,
+    без сериализации. Если представление зависит от связей пользователя
+    (user_dependent), в ETag добавляется их отпечаток, а Last-Modified
+    для авторизованных не отдается. Данные других моделей в ответе
+    (version_models, например авторы рецептов) учитываются версией
+    из recipes.catalog.
+
+    Last-Modified отдается только для одного объекта без version_models:
+    у списка Max(updated_at) не меняется при удалении строк, а версии
+    других моделей не двигают updated_at. В остальных случаях
+    изменения отслеживаются только по ETag.
+    """
+    user_dependent = False
+    version_models = ()
+
+    def get_validation_queryset(self):
+        """Выборка для валидаторов, без аннотаций и подгрузок."""
+        return self.get_queryset()
+
+    def get_validators(self, queryset, many=False):
+        state = queryset.order_by().aggregate(
+            count=Count('pk'), last_modified=Max('updated_at'))
+        last_modified = state['last_modified']
+        parts = [self.request.get_full_path(), state['count'], last_modified]
+        parts += [get_catalog_version(model) for model in self.version_models]
+        if many or self.version_models:
+            last_modified = None
+        if self.user_dependent:
+            user = self.request.user
+            parts += [user.pk, relations_state(user)]
+            if user.is_authenticated:
+                last_modified = None
+        etag = hashlib.md5(repr(parts).encode()).hexdigest()
+        if last_modified is not None:
+            last_modified = timegm(last_modified.utctimetuple())
+        return f'"{etag}"', last_modified
+
+    def conditional_response(self, queryset, handler, *args, many=False,
+                             **kwargs):
+        etag, last_modified = self.get_validators(queryset, many)
+        response = get_conditional_response(
+            self.request._request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(self.request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        if self.user_dependent:
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_validation_queryset())
+        return self.conditional_response(
+            queryset, super().list, *args, many=True, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_validation_queryset().filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return self.conditional_response(
+            queryset, super().retrieve, *args, **kwargs)
+
+
+class CatalogCacheMixin(ConditionalMixin):
+    """Кэш готовых ответов справочника.
+
+    Ключ включает версию справочника, путь с параметрами и заголовок
+    Accept. Совпадение ETag и попадание в кэш обходятся без ORM.
+    Кэшируются только ответы JSON: страница browsable API содержит
+    имя текущего пользователя.
+    """
+
+    @cached_property
+    def catalog_key(self):
+        version = get_catalog_version(self.queryset.model)
+        variant = hashlib.md5(
+            f'{self.request.get_full_path()}|'
+            f'{self.request.META.get("HTTP_ACCEPT", "")}'.encode()
+        ).hexdigest()
+        label = self.queryset.model._meta.label_lower
+        return f'catalog:{label}:{version}:{variant}'
+
+    def get_validators(self, queryset, many=False):
+        etag = hashlib.md5(self.catalog_key.encode()).hexdigest()
+        return f'"{etag}"', None
+
+    def conditional_response(self, queryset, handler, *args, many=False,
+                             **kwargs):
+        if self.request.accepted_renderer.format != 'json':
+            return handler(self.request, *args, **kwargs)
+
+        def cached_handler(request, *args, **kwargs):
+            cached = catalog_cache().get(self.catalog_key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+            self.cache_response = True
+            return handler(request, *args, **kwargs)
+
+        return super().conditional_response(
+            queryset, cached_handler, *args, many=many, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        if (getattr(self, 'cache_response', False)
+                and isinstance(response, Response)
+                and response.status_code == 200):
+            response.render()
+            catalog_cache().set(
+                self.catalog_key,
+                (response.rendered_content, response['Content-Type'])
+            )
+        return response
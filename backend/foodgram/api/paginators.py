@@ -1,6 +1,100 @@
-from rest_framework.pagination import PageNumberPagination
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import close_old_connections, connections
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+@lru_cache(maxsize=None)
+def get_count_executor():
+    """Пул потоков для COUNT(*), создается при первом обращении."""
+    return ThreadPoolExecutor(
+        max_workers=settings.PAGINATION_COUNT_WORKERS,
+        thread_name_prefix='pagination-count',
+    )
+
+
+def _count(queryset):
+    # Поток пула живет дольше запроса: соединения обслуживаются так же,
+    # как Django обслуживает их в начале и конце запроса.
+    close_old_connections()
+    try:
+        return queryset.count()
+    finally:
+        close_old_connections()
+
+
+class ConcurrentCountPaginator(Paginator):
+    """Пагинатор, считающий COUNT(*) параллельно с выборкой страницы.
+
+    Запросы независимы, поэтому время ответа определяет более долгий из
+    них, а не их сумма. Счет идет в отдельном соединении и не видит
+    незафиксированных изменений, поэтому внутри транзакции пагинатор
+    работает последовательно. Включается PAGINATION_CONCURRENT_COUNT
+    и только при постоянных соединениях (CONN_MAX_AGE не 0): иначе
+    поток пула открывал бы новое соединение на каждый счет.
+    """
+
+    def page(self, number):
+        if not self.concurrent():
+            return super().page(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 0
+        if number < 1:
+            # Ошибку номера страницы выдаст обычная проверка.
+            return super().page(number)
+        future = get_count_executor().submit(_count, self.object_list)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page])
+        self.count = future.result()
+        # Номер страницы проверяется, когда количество уже известно.
+        return self._get_page(rows, self.validate_number(number), self)
+
+    def concurrent(self):
+        db = getattr(self.object_list, 'db', None)
+        if not settings.PAGINATION_CONCURRENT_COUNT or db is None:
+            return False
+        connection = connections[db]
+        return (connection.settings_dict['CONN_MAX_AGE'] != 0
+                and not connection.in_atomic_block)
+
+
+class LimitCursorPagination(CursorPagination):
+    """Курсорный пагинатор: страница без OFFSET и COUNT(*)."""
+    page_size_query_param = 'limit'
+
+    def get_ordering(self, request, queryset, view):
+        # Сохраняем порядок выборки, по умолчанию '-id'.
+        return tuple(
+            queryset.query.order_by
+            or queryset.model._meta.ordering
+            or ('-id',)
+        )
 
 
 class LimitPagePagination(PageNumberPagination):
-    """Фильтр пагинатора."""
+    """Фильтр пагинатора.
+
+    При наличии параметра cursor (пустого для первой страницы)
+    переключается на курсорную пагинацию.
+    """
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    django_paginator_class = ConcurrentCountPaginator
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = LimitCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,204 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+import django
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+FONT_NAME = 'FreeSans'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'FreeSans.ttf')
+# Разметка страницы списка покупок (от левого нижнего угла).
+PAGE_TOP = 800
+PAGE_BOTTOM = 50
+LINE_HEIGHT = 15
+# Количество последних замеров времени отрисовки для статистики.
+LATENCY_WINDOW = 1000
+
+
+@lru_cache(maxsize=None)
+def register_font():
+    """Регистрация шрифта, один раз на процесс."""
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def init_worker():
+    """Запуск процесса пула: приложения Django и шрифт."""
+    django.setup()
+    register_font()
+
+
+def _new_page(page):
+    """Начать страницу, вернуть позицию первой строки."""
+    page.setFont(FONT_NAME, 12)
+    return PAGE_TOP
+
+
+def render_shopping_list(rows):
+    """Отрисовка списка покупок (постранично), байты PDF."""
+    register_font()
+    buffer = io.BytesIO()
+    page = canvas.Canvas(buffer, pagesize=A4)
+    position_y = _new_page(page)
+    position_x = 250
+    page.drawString(position_x, position_y, 'Список покупок.')
+    if not rows:
+        position_y -= 100  # отступаем от заголовка
+        page.drawString(position_x, position_y,
+                        'Нет ингредиентов для покупок!')
+    else:
+        # задаем координаты для первой строки списка
+        position_x = 50  # на вскидуку отступаем от края листа
+        position_y -= 30  # отступаем от заголовка
+        for ingredient in rows:
+            position_y -= LINE_HEIGHT  # отступаем от предыдущей строки
+            if position_y < PAGE_BOTTOM:
+                page.showPage()
+                position_y = _new_page(page)
+            page.drawString(position_x, position_y,
+                            f'* {ingredient["name"]}: '
+                            f'{ingredient["amount"]}'
+                            f'{ingredient["measure"]}')
+    page.showPage()
+    page.save()
+    return buffer.getvalue()
+
+
+class PDFServiceUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервис PDF перегружен, повторите запрос позже.'
+    default_code = 'pdf_unavailable'
+    wait = 1  # заголовок Retry-After
+
+
+class PDFRenderTimeout(PDFServiceUnavailable):
+    default_detail = 'Превышено время формирования PDF.'
+    default_code = 'pdf_timeout'
+
+
+class PDFRenderService:
+    """Отрисовка PDF в пуле процессов.
+
+    Процессы пула запускаются через forkserver, а не fork: fork
+    многопоточного воркера gunicorn копирует блокировки, занятые другими
+    потоками. Процессы регистрируют шрифт один раз при запуске. Число задач
+    в работе и в очереди ограничено max_pending: сверх него запрос сразу
+    получает отказ (503), а не ждет. Ожидание результата ограничено
+    timeout. При workers=0 PDF рисуется в вызывающем потоке.
+    """
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pending = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counts = {'rendered': 0, 'rejected': 0, 'timeouts': 0,
+                       'failed': 0}
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('forkserver'),
+                    initializer=init_worker)
+            return self.executor
+
+    def render(self, rows):
+        """Байты PDF для строк списка покупок."""
+        if not self.slots.acquire(blocking=False):
+            self._count('rejected')
+            raise PDFServiceUnavailable
+        started = time.perf_counter()
+        with self.lock:
+            self.pending += 1
+        try:
+            pdf = self._render(rows)
+        except FutureTimeoutError:
+            self._count('timeouts')
+            raise PDFRenderTimeout
+        except Exception:
+            self._count('failed')
+            raise
+        self.latencies.append(time.perf_counter() - started)
+        self._count('rendered')
+        return pdf
+
+    def _render(self, rows):
+        if not self.workers:
+            try:
+                return render_shopping_list(rows)
+            finally:
+                self._release()
+        try:
+            future = self.get_executor().submit(render_shopping_list, rows)
+        except BrokenProcessPool:
+            self._release()
+            self._reset()
+            raise
+        # Место в очереди освобождается, когда процесс закончит работу,
+        # даже если ответ уже ушел по таймауту.
+        future.add_done_callback(lambda future: self._release())
+        try:
+            return future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            self._reset()
+            raise
+
+    def _release(self):
+        with self.lock:
+            self.pending -= 1
+        self.slots.release()
+
+    def _reset(self):
+        # Упавший пул не принимает задач, следующий вызов создаст новый.
+        with self.lock:
+            self.executor = None
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        """Глубина очереди, счетчики и время отрисовки (мс) процесса."""
+        latencies = sorted(self.latencies)
+
+        def percentile(share):
+            if not latencies:
+                return None
+            index = min(len(latencies) - 1, int(len(latencies) * share))
+            return round(latencies[index] * 1000, 1)
+
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'pending': self.pending,
+                **self.counts,
+                'latency_p50_ms': percentile(0.5),
+                'latency_p95_ms': percentile(0.95),
+            }
+
+
+@lru_cache(maxsize=None)
+def get_pdf_service():
+    """Сервис отрисовки PDF, создается при первом обращении."""
+    return PDFRenderService(
+        workers=settings.PDF_WORKERS,
+        max_pending=settings.PDF_MAX_PENDING,
+        timeout=settings.PDF_RENDER_TIMEOUT,
+    )
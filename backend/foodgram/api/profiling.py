@@ -0,0 +1,183 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+# Литералы и списки параметров, не влияющие на отпечаток запроса.
+_IN_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(sql):
+    """Запрос без значений: одинаковый у повторов с разными параметрами."""
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return ' '.join(_LITERAL_RE.sub('?', sql).split())
+
+
+class RequestProfile:
+    """Замеры одного запроса: SQL, участки кода и время представления."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        # Участок: [время, количество SQL-запросов].
+        self.sections = defaultdict(lambda: [0.0, 0])
+        self.depth = Counter()
+        self.view_time = None
+
+    def execute(self, execute, sql, params, many, context):
+        """Обертка выполнения SQL (connection.execute_wrapper)."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+            for name, depth in self.depth.items():
+                if depth:
+                    self.sections[name][1] += 1
+
+    def duplicates(self, limit=None):
+        """Отпечатки запросов, выполненных больше одного раза."""
+        return [(sql, count)
+                for sql, count in self.fingerprints.most_common(limit)
+                if count > 1]
+
+    def server_timing(self, total):
+        """Значение заголовка Server-Timing, длительности в мс."""
+        metrics = [
+            f'total;dur={total * 1000:.1f}',
+            f'sql;dur={self.sql_time * 1000:.1f};'
+            f'desc="{self.queries} queries, '
+            f'{len(self.duplicates())} duplicated"',
+        ]
+        if self.view_time is not None:
+            metrics.append(f'view;dur={self.view_time * 1000:.1f}')
+        for name, (duration, queries) in sorted(self.sections.items()):
+            metrics.append(f'{name};dur={duration * 1000:.1f};'
+                           f'desc="{queries} queries"')
+        return ', '.join(metrics)
+
+
+class ProfiledSection:
+    """Замер участка кода в профиле текущего запроса.
+
+    Работает как контекстный менеджер и декоратор. Вложенные участки
+    с тем же именем не учитываются повторно. Без профиля ничего не делает.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.profile = None
+        self.started = None
+
+    def __enter__(self):
+        self.profile = getattr(_local, 'profile', None)
+        if self.profile is not None:
+            self.profile.depth[self.name] += 1
+            if self.profile.depth[self.name] == 1:
+                self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        profile = self.profile
+        if profile is None:
+            return
+        profile.depth[self.name] -= 1
+        if not profile.depth[self.name]:
+            profile.sections[self.name][0] += (
+                time.perf_counter() - self.started)
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with ProfiledSection(self.name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def profiled(name):
+    """Участок name: контекстный менеджер или декоратор."""
+    return ProfiledSection(name)
+
+
+class ProfiledSerializerMixin:
+    """Время и SQL-запросы сериализации в профиле запроса."""
+
+    def to_representation(self, instance):
+        with profiled('serializer'):
+            return super().to_representation(instance)
+
+
+class ProfilingMiddleware:
+    """Профилирование запросов, включается настройкой PROFILING.
+
+    Отдает замеры в заголовке Server-Timing. Запросы дольше
+    PROFILING_SLOW_REQUEST_MS пишутся в журнал одной JSON-строкой вместе
+    с самыми частыми повторяющимися SQL-запросами. Должен стоять
+    последним в MIDDLEWARE: время представления считается от
+    process_view до ответа.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = _local.profile = RequestProfile()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute))
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        total = time.perf_counter() - started
+        if profile.view_time is not None:
+            profile.view_time = time.perf_counter() - profile.view_time
+        response['Server-Timing'] = profile.server_timing(total)
+        if total * 1000 >= settings.PROFILING_SLOW_REQUEST_MS:
+            self.log_slow_request(request, response, profile, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _local.profile.view_time = time.perf_counter()
+
+    def log_slow_request(self, request, response, profile, total):
+        record = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'view_ms': (None if profile.view_time is None
+                        else round(profile.view_time * 1000, 1)),
+            'sql_ms': round(profile.sql_time * 1000, 1),
+            'queries': profile.queries,
+            'sections': {
+                name: {'ms': round(duration * 1000, 1), 'queries': queries}
+                for name, (duration, queries) in profile.sections.items()
+            },
+            'duplicates': [
+                {'sql': sql, 'count': count}
+                for sql, count in profile.duplicates(
+                    settings.PROFILING_TOP_DUPLICATES)
+            ],
+        }
+        logger.warning(json.dumps(record, ensure_ascii=False))
@@ -0,0 +1,62 @@
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.functional import cached_property
+
+from recipes.models import Favorite, ShoppingCard, Subscription, User
+
+
+class UserRelations:
+    """Связи текущего пользователя с авторами и рецептами.
+
+    Каждое множество загружается одним запросом при первом обращении.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def _ids(self, model, field):
+        if self.user.is_anonymous:
+            return frozenset()
+        return frozenset(
+            model.objects.filter(user=self.user)
+            .values_list(field, flat=True)
+        )
+
+    @cached_property
+    def subscribed_authors(self):
+        return self._ids(Subscription, 'author_id')
+
+    @cached_property
+    def favorited_recipes(self):
+        return self._ids(Favorite, 'recipe_id')
+
+    @cached_property
+    def cart_recipes(self):
+        return self._ids(ShoppingCard, 'recipe_id')
+
+
+def get_user_relations(request):
+    """Связи пользователя, общие для всех сериализаторов запроса."""
+    relations = getattr(request, '_user_relations', None)
+    if relations is None:
+        relations = UserRelations(request.user)
+        request._user_relations = relations
+    return relations
+
+
+def relations_state(user):
+    """Отпечаток связей пользователя одним запросом.
+
+    Связи только создаются и удаляются, поэтому число записей и
+    наибольший id каждой из них меняются при любом изменении.
+    """
+    if user.is_anonymous:
+        return None
+    states = {}
+    for model in (Subscription, Favorite, ShoppingCard):
+        rows = model.objects.filter(user=OuterRef('pk')).order_by()
+        for func in (Count, Max):
+            states[f'{model.__name__}_{func.__name__}'] = Subquery(
+                rows.values('user').annotate(value=func('pk')).values('value')
+            )
+    return User.objects.filter(pk=user.pk).annotate(
+        **states).values_list(*states).first()
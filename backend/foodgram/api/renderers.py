@@ -0,0 +1,90 @@
+import csv
+
+from django.http import StreamingHttpResponse
+from rest_framework import renderers
+
+# Размер куска потокового ответа: строки копятся до него и
+# отправляются вместе.
+STREAM_CHUNK_SIZE = 16 * 1024
+# Количество строк, выбираемых из курсора за раз.
+STREAM_FETCH_SIZE = 2000
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    """Формат выгрузки списка покупок.
+
+    Файл отдает само представление, через рендерер проходят только
+    ответы с ошибкой: они отдаются в JSON.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return renderers.JSONRenderer().render(data)
+
+
+class PlainTextShoppingListRenderer(ShoppingListRenderer):
+    """Текст из строк shopping_list (name, amount, measure).
+
+    Текст строится построчно (stream), поэтому ответ передается
+    потоково.
+    """
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        yield 'Список покупок.\n\n'
+        empty = True
+        for row in rows:
+            empty = False
+            yield f'* {row["name"]}: {row["amount"]} {row["measure"]}\n'
+        if empty:
+            yield 'Нет ингредиентов для покупок!\n'
+
+    def streaming_response(self, queryset, filename):
+        """Потоковый ответ: строки читаются курсором по мере отправки."""
+        response = StreamingHttpResponse(
+            self._chunks(queryset.iterator(chunk_size=STREAM_FETCH_SIZE)),
+            content_type=f'{self.media_type}; charset={self.charset}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}.{self.format}"')
+        return response
+
+    def _chunks(self, rows):
+        buffer, size = [], 0
+        for part in self.stream(rows):
+            part = part.encode(self.charset)
+            buffer.append(part)
+            size += len(part)
+            if size >= STREAM_CHUNK_SIZE:
+                yield b''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield b''.join(buffer)
+
+
+class _Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(PlainTextShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(('name', 'amount', 'measurement_unit'))
+        for row in rows:
+            yield writer.writerow(
+                (row['name'], row['amount'], row['measure']))
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """PDF отдается представлением из кэша PDF (get_pdf_shopping_cart)."""
+    media_type = 'application/pdf'
+    format = 'pdf'
@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.contrib.auth.hashers import make_password
-from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
 from rest_framework import serializers
 
 from recipes import models
+from recipes.cart import refresh_recipe_carts
+from recipes.search import build_search_document
 
+from .fields import BulkPrimaryKeyRelatedField, RecipeImageField, resolve_pks
+from .profiling import ProfiledSerializerMixin
+from .relations import get_user_relations
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(ProfiledSerializerMixin,
+                     serializers.ModelSerializer):
     """Пользователи."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -24,14 +32,15 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         """Наличие подписки на полученного(ых) пользователя(ей)."""
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return models.Subscription.objects.filter(user=user,
-                                                  author=obj).exists()
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
+        relations = get_user_relations(self.context.get('request'))
+        return obj.pk in relations.subscribed_authors
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(ProfiledSerializerMixin,
+                    serializers.ModelSerializer):
     """Теги."""
 
     class Meta:
@@ -39,7 +48,8 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'color', 'slug']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(ProfiledSerializerMixin,
+                           serializers.ModelSerializer):
     """Ингредиенты."""
 
     class Meta:
@@ -48,9 +58,11 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class IngredientInRecipeSerializer(serializers.ModelSerializer):
-    """Ингредиенты в рецепте и их количество."""
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=models.Ingredient.objects.all())
+    """Ингредиенты в рецепте и их количество.
+
+    Ингредиенты по id выбираются в RecipeSerializer одним запросом.
+    """
+    id = serializers.IntegerField()
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit'
@@ -61,15 +73,17 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'amount', 'measurement_unit')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(ProfiledSerializerMixin,
+                       serializers.ModelSerializer):
     """Рецепты."""
     author = UserSerializer(default=serializers.CurrentUserDefault())
     ingredients = IngredientInRecipeSerializer(many=True)
+    tags = BulkPrimaryKeyRelatedField(queryset=models.Tag.objects.all())
     is_favorited = serializers.SerializerMethodField(
         method_name='_get_is_favorited')
     is_in_shopping_cart = serializers.SerializerMethodField(
         method_name='_get_is_shopping_cart')
-    image = Base64ImageField()
+    image = RecipeImageField(variant='image_card')
 
     class Meta:
         model = models.Recipe
@@ -78,17 +92,30 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'name', 'image', 'text', 'cooking_time']
 
     def _get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return models.Favorite.objects.filter(user=user, recipe=obj).exists()
+        is_favorited = getattr(obj, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
+        relations = get_user_relations(self.context.get('request'))
+        return obj.pk in relations.favorited_recipes
 
     def _get_is_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return models.ShoppingCard.objects.filter(user=user,
-                                                  recipe=obj).exists()
+        is_in_shopping_cart = getattr(obj, 'is_in_shopping_cart', None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
+        relations = get_user_relations(self.context.get('request'))
+        return obj.pk in relations.cart_recipes
+
+    def validate_ingredients(self, value):
+        ingredients, missing = resolve_pks(
+            models.Ingredient.objects.all(), [item['id'] for item in value])
+        if missing:
+            raise serializers.ValidationError(
+                'Не найдены ингредиенты с id: '
+                + ', '.join(map(str, missing)) + '.'
+            )
+        for item, ingredient in zip(value, ingredients):
+            item['id'] = ingredient
+        return value
 
     def validate(self, data):
         if len(data['ingredients']) < 1:
@@ -106,7 +133,6 @@ class RecipeSerializer(serializers.ModelSerializer):
             )
         ingredients = []
         for ingredient in data['ingredients']:
-            print('ingredient["amount"]', ingredient['amount'])
             if ingredient['amount'] < 1:
                 raise serializers.ValidationError(
                     {'amount': 'Убедитесь, что это значение больше либо '
@@ -121,6 +147,10 @@ class RecipeSerializer(serializers.ModelSerializer):
         return data
 
     def to_representation(self, instance):
+        # Признак подписки на автора, если он уже вычислен в выборке.
+        is_author_subscribed = getattr(instance, 'is_author_subscribed', None)
+        if is_author_subscribed is not None:
+            instance.author.is_subscribed = is_author_subscribed
         represent = super().to_representation(instance)
         # Добавить детализацию тегов.
         represent['tags'] = []
@@ -130,13 +160,20 @@ class RecipeSerializer(serializers.ModelSerializer):
         represent['ingredients'] = []
         for ingredient in instance.ingredients.all():
             data = IngredientSerializer(ingredient.ingredients).data
-            data['amount'] = (
-                IngredientInRecipeSerializer(ingredient).
-                data['amount']
-            )
+            data['amount'] = ingredient.amount
             represent['ingredients'].append(data)
         return represent
 
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            # Временный файл изображения закрываем сами: после переноса
+            # в хранилище его уже нет на месте, и закрытие это учитывает.
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
     @staticmethod
     def _create_ingredients(recipe, validated_data):
         ingr_in_recipe = [
@@ -146,21 +183,98 @@ class RecipeSerializer(serializers.ModelSerializer):
             for ingredient in validated_data]
         models.IngredientInRecipe.objects.bulk_create(ingr_in_recipe)
 
+    @staticmethod
+    def _update_ingredients(recipe, validated_data):
+        """Изменение ингредиентов рецепта по разнице с текущими."""
+        amounts = {item['id'].pk: item['amount'] for item in validated_data}
+        # Строки рецепта берутся из предвыборки, если она уже сделана.
+        current = {row.ingredients_id: row for row in recipe.ingredients.all()}
+        removed = [row.pk for pk, row in current.items() if pk not in amounts]
+        changed = []
+        for pk, row in current.items():
+            if pk in amounts and row.amount != amounts[pk]:
+                row.amount = amounts[pk]
+                changed.append(row)
+        if removed:
+            models.IngredientInRecipe.objects.filter(pk__in=removed).delete()
+        if changed:
+            models.IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        models.IngredientInRecipe.objects.bulk_create(
+            models.IngredientInRecipe(recipes=recipe, ingredients_id=pk,
+                                      amount=amount)
+            for pk, amount in amounts.items() if pk not in current
+        )
+        # Сводки корзин с этим рецептом пересчитываются по затронутым
+        # ингредиентам.
+        touched = (current.keys() ^ amounts.keys()) | {
+            row.ingredients_id for row in changed}
+        if touched:
+            refresh_recipe_carts(recipe.pk, touched)
+
+    @staticmethod
+    def _update_tags(recipe, tags):
+        """Изменение тегов рецепта по разнице с текущими."""
+        through = models.Recipe.tags.through
+        new = {tag.pk for tag in tags}
+        current = {tag.pk for tag in recipe.tags.all()}
+        if current - new:
+            through.objects.filter(
+                recipe=recipe, tag_id__in=current - new).delete()
+        through.objects.bulk_create(
+            through(recipe=recipe, tag_id=pk) for pk in new - current)
+
+    @staticmethod
+    def _create_tags(recipe, tags):
+        through = models.Recipe.tags.through
+        through.objects.bulk_create(
+            through(recipe=recipe, tag=tag) for tag in tags)
+
+    @staticmethod
+    def _search_document(data, instance=None):
+        """Поисковый документ по проверенным данным и текущему рецепту."""
+        if 'tags' in data:
+            tags = data['tags']
+        else:
+            tags = instance.tags.all()
+        if 'ingredients' in data:
+            ingredients = [item['id'] for item in data['ingredients']]
+        else:
+            ingredients = [row.ingredients
+                           for row in instance.ingredients.all()]
+        return build_search_document(
+            data.get('name', getattr(instance, 'name', '')),
+            data.get('text', getattr(instance, 'text', '')),
+            [tag.name for tag in tags],
+            [ingredient.name for ingredient in ingredients],
+        )
+
+    @transaction.atomic
     def create(self, validated_data):
+        validated_data['search_document'] = self._search_document(
+            validated_data)
         ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags')
         recipe = super().create(validated_data)
+        self._create_tags(recipe=recipe, tags=tags)
         self._create_ingredients(recipe=recipe, validated_data=ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
+        validated_data['search_document'] = self._search_document(
+            validated_data, instance)
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
         recipe = super().update(instance, validated_data)
-        models.IngredientInRecipe.objects.filter(recipes=recipe).all().delete()
-        self._create_ingredients(recipe=recipe, validated_data=ingredients)
+        if ingredients is not None:
+            self._update_ingredients(recipe, ingredients)
+        if tags is not None:
+            self._update_tags(recipe, tags)
         return recipe
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(ProfiledSerializerMixin,
+                         serializers.ModelSerializer):
     """Избранное."""
     user = serializers.PrimaryKeyRelatedField(
         queryset=models.User.objects.all(),
@@ -172,7 +286,8 @@ class FavoriteSerializer(serializers.ModelSerializer):
     )
     id = serializers.ReadOnlyField(source='recipe.id')
     name = serializers.ReadOnlyField(source='recipe.name')
-    image = Base64ImageField(source='recipe.image', read_only=True)
+    image = RecipeImageField(source='recipe.image',
+                             variant='image_thumbnail', read_only=True)
     cooking_time = serializers.ReadOnlyField(source='recipe.cooking_time')
 
     class Meta:
@@ -181,7 +296,8 @@ class FavoriteSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'name', 'image', 'cooking_time']
 
 
-class ShoppingCardSerializer(serializers.ModelSerializer):
+class ShoppingCardSerializer(ProfiledSerializerMixin,
+                             serializers.ModelSerializer):
     """Карта покупок."""
     user = serializers.PrimaryKeyRelatedField(
         queryset=models.User.objects.all(),
@@ -193,7 +309,8 @@ class ShoppingCardSerializer(serializers.ModelSerializer):
     )
     id = serializers.ReadOnlyField(source='recipe.id')
     name = serializers.ReadOnlyField(source='recipe.name')
-    image = Base64ImageField(source='recipe.image', read_only=True)
+    image = RecipeImageField(source='recipe.image',
+                             variant='image_thumbnail', read_only=True)
     cooking_time = serializers.ReadOnlyField(source='recipe.cooking_time')
 
     class Meta:
@@ -202,15 +319,32 @@ class ShoppingCardSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'name', 'image', 'cooking_time']
 
 
-class SubscribeRecipesSerializer(serializers.ModelSerializer):
+class ShoppingCartItemSerializer(ProfiledSerializerMixin,
+                                 serializers.ModelSerializer):
+    """Ингредиент в сводке корзины и его общее количество."""
+    id = serializers.ReadOnlyField(source='ingredient_id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = models.ShoppingCartItem
+        fields = ('id', 'name', 'amount', 'measurement_unit')
+
+
+class SubscribeRecipesSerializer(ProfiledSerializerMixin,
+                                 serializers.ModelSerializer):
     """Сериализатор рецептов, для сериализатора подписок."""
+    image = RecipeImageField(variant='image_thumbnail', read_only=True)
 
     class Meta:
         model = models.Recipe
         fields = ['id', 'name', 'image', 'cooking_time']
 
 
-class SubscribeSerializer(serializers.ModelSerializer):
+class SubscribeSerializer(ProfiledSerializerMixin,
+                          serializers.ModelSerializer):
     """Подписки на авторов."""
     user = serializers.PrimaryKeyRelatedField(
         queryset=models.User.objects.all(),
@@ -238,14 +372,30 @@ class SubscribeSerializer(serializers.ModelSerializer):
                   ]
 
     def get_recipes(self, obj):
-        limit = self.context.get('request').GET.get('recipes_limit')
-        limit = int(limit) if limit else None
-        recipes = models.Recipe.objects.filter(author=obj.author)
-        return SubscribeRecipesSerializer(recipes[:limit], many=True).data
+        previews = self.context.get('recipes')
+        if previews is not None:
+            recipes = previews.get(obj.author_id, [])
+        else:
+            limit = self.context.get('request').GET.get('recipes_limit')
+            limit = int(limit) if limit else None
+            recipes = models.Recipe.objects.filter(author=obj.author)[:limit]
+        return SubscribeRecipesSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
-        return models.Recipe.objects.filter(author=obj.author).count()
+        try:
+            return obj.author.counters.recipes_count
+        except models.UserCounter.DoesNotExist:
+            return models.Recipe.objects.filter(author=obj.author).count()
 
     def get_is_subscribed(self, obj):
-        return models.Subscription.objects.filter(user=obj.user,
-                                                  author=obj.author).exists()
+        # Сериализуется сама подписка, значит пользователь подписан.
+        return True
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для пакетного добавления или удаления."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_IDS,
+    )
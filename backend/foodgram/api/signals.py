@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import ShoppingCard
+from recipes.signals import relations_bulk_changed
+
+from .utils import drop_pdf_shopping_cart
+
+
+@receiver(post_save, sender=ShoppingCard)
+@receiver(post_delete, sender=ShoppingCard)
+def shopping_cart_changed(sender, instance, **kwargs):
+    """Изменение корзины делает недействительным её PDF."""
+    drop_pdf_shopping_cart(instance.user_id)
+
+
+@receiver(relations_bulk_changed, sender=ShoppingCard)
+def shopping_cart_bulk_changed(sender, user, **kwargs):
+    drop_pdf_shopping_cart(user.pk)
@@ -0,0 +1,56 @@
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, User
+
+# Поля рецепта, не важные для тестов.
+RECIPE_DEFAULTS = {
+    'text': 'Описание',
+    'cooking_time': 10,
+    'image': 'recipes/test.png',
+}
+
+
+def create_user(username, **kwargs):
+    """Пользователь username с почтой username@foodgram.ru и паролем pass."""
+    return User.objects.create_user(
+        username=username, email=f'{username}@foodgram.ru', password='pass',
+        **kwargs)
+
+
+def create_superuser(username='admin'):
+    return User.objects.create_superuser(
+        username=username, email=f'{username}@foodgram.ru', password='pass')
+
+
+def new_recipe(author, name='Рецепт', **kwargs):
+    """Несохраненный рецепт, например для bulk_create."""
+    return Recipe(name=name, author=author, **{**RECIPE_DEFAULTS, **kwargs})
+
+
+def create_recipe(author, name='Рецепт', **kwargs):
+    recipe = new_recipe(author, name, **kwargs)
+    recipe.save()
+    return recipe
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+def api_client(user=None):
+    """Клиент API, авторизованный как user (без user - гость)."""
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+class APITestCase(TestCase):
+    """Тест с пустыми кэшами: ответы и версии справочников не
+    переходят из теста в тест."""
+
+    def setUp(self):
+        clear_caches()
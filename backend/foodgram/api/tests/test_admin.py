@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.filters import ingredient_letters
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCard, Subscription)
+from recipes.paginators import EstimatedCountPaginator
+
+from .base import (APITestCase, clear_caches, create_recipe, create_superuser,
+                   create_user)
+
+CHANGELISTS = (
+    '/admin/recipes/recipe/',
+    '/admin/recipes/ingredient/',
+    '/admin/recipes/ingredientinrecipe/',
+    '/admin/recipes/favorite/',
+    '/admin/recipes/shoppingcard/',
+    '/admin/recipes/subscription/',
+)
+
+
+class AdminChangelistTestCase(APITestCase):
+    """Списки админки: число запросов не зависит от числа строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_superuser()
+        cls.ingredient = Ingredient.objects.create(name='соль',
+                                                   measurement_unit='г')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, start, count):
+        for i in range(start, start + count):
+            user = create_user(f'user{i}')
+            recipe = create_recipe(user, f'Рецепт {i}')
+            IngredientInRecipe.objects.create(
+                recipes=recipe, ingredients=self.ingredient, amount=1)
+            Favorite.objects.create(user=user, recipe=recipe)
+            ShoppingCard.objects.create(user=user, recipe=recipe)
+            Subscription.objects.create(user=user, author=self.admin)
+
+    def count_queries(self, url):
+        clear_caches()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_flat_queries(self):
+        self.add_rows(0, 2)
+        small = {url: self.count_queries(url) for url in CHANGELISTS}
+        self.add_rows(2, 10)
+        for url in CHANGELISTS:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), small[url])
+
+    def test_autocomplete_widgets(self):
+        self.add_rows(0, 2)
+        recipe = Recipe.objects.get(author__username='user0')
+        for url in (f'/admin/recipes/recipe/{recipe.pk}/change/',
+                    '/admin/recipes/favorite/add/',
+                    '/admin/recipes/subscription/add/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'admin-autocomplete')
+                # Пользователи не выводятся списком в форме.
+                self.assertNotContains(response, 'user1</option>')
+
+    def test_ingredient_rows_update_search(self):
+        self.add_rows(0, 1)
+        row = IngredientInRecipe.objects.get()
+        pepper = Ingredient.objects.create(name='перец', measurement_unit='г')
+        response = self.client.post(
+            f'/admin/recipes/ingredientinrecipe/{row.pk}/change/',
+            {'recipes': row.recipes_id, 'ingredients': pepper.pk,
+             'amount': 2})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('перец', Recipe.objects.get().search_document)
+        response = self.client.post(
+            f'/admin/recipes/ingredientinrecipe/{row.pk}/delete/',
+            {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('перец', Recipe.objects.get().search_document)
+
+    def test_ingredient_letters(self):
+        Ingredient.objects.create(name='сахар', measurement_unit='г')
+        Ingredient.objects.create(name='мука', measurement_unit='г')
+        with self.assertNumQueries(1):
+            self.assertEqual(ingredient_letters(), [('м', 1), ('с', 2)])
+        with self.assertNumQueries(0):
+            ingredient_letters()
+        response = self.client.get('/admin/recipes/ingredient/')
+        self.assertContains(response, 'с (2)')
+        # Изменение справочника сбрасывает кэш букв.
+        Ingredient.objects.create(name='мёд', measurement_unit='г')
+        self.assertEqual(ingredient_letters(), [('м', 2), ('с', 2)])
+
+    def test_estimated_count(self):
+        queryset = Recipe.objects.all()
+        with mock.patch.object(EstimatedCountPaginator, 'estimate',
+                               return_value=5 * 10 ** 6):
+            self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 0)
+            with mock.patch.object(connection, 'vendor', 'postgresql'):
+                self.assertEqual(
+                    EstimatedCountPaginator(queryset, 10).count, 5 * 10 ** 6)
@@ -0,0 +1,116 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Favorite, Recipe, ShoppingCard, Subscription
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..utils import SHOPPING_CART_PDF_KEY
+from .base import APITestCase, api_client, create_recipe, create_user
+
+
+class BulkRelationsTestCase(APITestCase):
+    """Пакетные изменения избранного, корзины и подписок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.authors = [
+            create_user(f'author{i}')
+            for i in range(25)
+        ]
+        cls.recipes = [
+            create_recipe(cls.authors[i], f'Рецепт {i}')
+            for i in range(25)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+
+    def send(self, method, url, ids, expected=status.HTTP_200_OK):
+        response = getattr(self.client, method)(url, {'ids': ids},
+                                                format='json')
+        self.assertEqual(response.status_code, expected)
+        if expected != status.HTTP_200_OK:
+            return response.json()
+        return {item['id']: item['status']
+                for item in response.json()['results']}
+
+    def test_favorite(self):
+        url = '/api/recipes/favorite/'
+        first, second, third = (recipe.pk for recipe in self.recipes[:3])
+        Favorite.objects.create(user=self.user, recipe_id=third)
+        self.assertEqual(
+            self.send('post', url, [first, second, first, third, 9001]),
+            {first: 'created', second: 'created', third: 'exists',
+             9001: 'not_found'}
+        )
+        self.assertEqual(
+            set(Favorite.objects.filter(user=self.user)
+                .values_list('recipe_id', flat=True)),
+            {first, second, third}
+        )
+        self.assertEqual(
+            Recipe.objects.get(pk=first).favorites_count, 1)
+        self.assertEqual(
+            self.send('delete', url, [first, third, 9001]),
+            {first: 'deleted', third: 'deleted', 9001: 'not_found'}
+        )
+        self.assertEqual(
+            list(Favorite.objects.filter(user=self.user)
+                 .values_list('recipe_id', flat=True)),
+            [second]
+        )
+        self.assertEqual(Recipe.objects.get(pk=first).favorites_count, 0)
+        self.assertEqual(Recipe.objects.get(pk=third).favorites_count, 0)
+
+    def test_shopping_cart_drops_pdf(self):
+        key = SHOPPING_CART_PDF_KEY.format(user_id=self.user.pk)
+        recipe = self.recipes[0].pk
+        for method in ('post', 'delete'):
+            cache.set(key, ('digest', b'pdf'))
+            self.send(method, '/api/recipes/shopping_cart/', [recipe])
+            self.assertIsNone(cache.get(key))
+        self.assertFalse(ShoppingCard.objects.exists())
+        self.assertEqual(Recipe.objects.get(pk=recipe).carts_count, 0)
+
+    def test_subscribe(self):
+        url = '/api/users/subscribe/'
+        author = self.authors[0]
+        self.assertEqual(
+            self.send('post', url, [author.pk, self.user.pk]),
+            {author.pk: 'created', self.user.pk: 'forbidden'}
+        )
+        self.assertTrue(Subscription.objects.filter(
+            user=self.user, author=author).exists())
+        author.counters.refresh_from_db()
+        self.assertEqual(author.counters.followers_count, 1)
+        self.assertEqual(self.send('delete', url, [author.pk]),
+                         {author.pk: 'deleted'})
+        author.counters.refresh_from_db()
+        self.assertEqual(author.counters.followers_count, 0)
+
+    def test_invalid_payload(self):
+        url = '/api/recipes/favorite/'
+        for ids in ([], ['x'], [0], 'x', list(range(1, 200))):
+            with self.subTest(ids=ids):
+                self.assertIn(
+                    'ids', self.send('post', url, ids,
+                                     status.HTTP_400_BAD_REQUEST))
+        response = APIClient().post(url, {'ids': [1]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_constant_queries(self):
+        for url, targets in (('/api/recipes/favorite/', self.recipes),
+                             ('/api/recipes/shopping_cart/', self.recipes),
+                             ('/api/users/subscribe/', self.authors)):
+            for method in ('post', 'delete'):
+                counts = set()
+                for size in (1, 20):
+                    ids = [obj.pk for obj in targets[:size]]
+                    with CaptureQueriesContext(connection) as queries:
+                        self.send(method, url, ids)
+                    counts.add(len(queries))
+                with self.subTest(url=url, method=method):
+                    self.assertEqual(len(counts), 1, counts)
@@ -0,0 +1,156 @@
+from unittest import mock
+
+from recipes import signals
+from recipes.cart import refresh_cart_items, shopping_list
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCard, ShoppingCartItem, Tag)
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .base import APITestCase, api_client, create_recipe, create_user
+
+
+class ShoppingCartSummaryTestCase(APITestCase):
+    """Сводка корзины: пересчет при изменении корзины и рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.tag = Tag.objects.create(name='Выпечка', color='#E26C2D',
+                                     slug='bakery')
+        cls.salt, cls.flour, cls.sugar, cls.pepper = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'мука', 'сахар', 'перец')
+        )
+        cls.bread, cls.cake = (
+            create_recipe(cls.author, name)
+            for name in ('Хлеб', 'Пирог')
+        )
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(recipes=cls.bread, ingredients=cls.salt,
+                               amount=10),
+            IngredientInRecipe(recipes=cls.bread, ingredients=cls.flour,
+                               amount=100),
+            IngredientInRecipe(recipes=cls.cake, ingredients=cls.salt,
+                               amount=5),
+            IngredientInRecipe(recipes=cls.cake, ingredients=cls.sugar,
+                               amount=20),
+        ])
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.reader)
+
+    def summary(self):
+        return {
+            item.ingredient.name: item.amount
+            for item in ShoppingCartItem.objects.filter(user=self.reader)
+            .select_related('ingredient')
+        }
+
+    def add(self, recipe):
+        response = self.client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_same_ingredient_merged(self):
+        self.add(self.bread)
+        self.add(self.cake)
+        self.assertEqual(self.summary(),
+                         {'соль': 15, 'мука': 100, 'сахар': 20})
+        self.assertEqual(list(shopping_list(self.reader)), [
+            {'name': 'мука', 'measure': 'г', 'amount': 100},
+            {'name': 'сахар', 'measure': 'г', 'amount': 20},
+            {'name': 'соль', 'measure': 'г', 'amount': 15},
+        ])
+        response = self.client.delete(
+            f'/api/recipes/{self.cake.pk}/shopping_cart/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.summary(), {'соль': 10, 'мука': 100})
+
+    def test_recipe_ingredients_changed(self):
+        self.add(self.bread)
+        self.add(self.cake)
+        author = api_client(self.author)
+        response = author.patch(f'/api/recipes/{self.bread.pk}/', {
+            'name': 'Хлеб', 'text': 'Описание', 'cooking_time': 10,
+            'ingredients': [{'id': self.salt.pk, 'amount': 7},
+                            {'id': self.pepper.pk, 'amount': 1}],
+            'tags': [self.tag.pk],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.summary(),
+                         {'соль': 12, 'сахар': 20, 'перец': 1})
+        Recipe.objects.filter(pk=self.cake.pk).delete()
+        self.assertEqual(self.summary(), {'соль': 7, 'перец': 1})
+
+    def test_recipe_deleted(self):
+        other = create_user('other')
+        self.add(self.bread)
+        self.add(self.cake)
+        ShoppingCard.objects.create(user=other, recipe=self.cake)
+        with mock.patch.object(signals, 'refresh_cart_items',
+                               wraps=refresh_cart_items) as refresh:
+            Recipe.objects.filter(pk=self.cake.pk).delete()
+        # Один пересчет на все корзины, только по ингредиентам рецепта.
+        refresh.assert_called_once()
+        users, ingredients = refresh.call_args[0]
+        self.assertCountEqual(users, [self.reader.pk, other.pk])
+        self.assertCountEqual(ingredients, [self.salt.pk, self.sugar.pk])
+        self.assertEqual(self.summary(), {'соль': 10, 'мука': 100})
+        self.assertFalse(ShoppingCartItem.objects.filter(user=other).exists())
+
+    def test_bulk_changes(self):
+        ids = {'ids': [self.bread.pk, self.cake.pk]}
+        url = '/api/recipes/shopping_cart/'
+        self.client.post(url, ids, format='json')
+        self.assertEqual(self.summary(),
+                         {'соль': 15, 'мука': 100, 'сахар': 20})
+        self.client.delete(url, {'ids': [self.bread.pk]}, format='json')
+        self.assertEqual(self.summary(), {'соль': 5, 'сахар': 20})
+
+    def test_preview(self):
+        self.add(self.cake)
+        response = self.client.get('/api/recipes/shopping_cart/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [
+            {'id': self.sugar.pk, 'name': 'сахар', 'amount': 20,
+             'measurement_unit': 'г'},
+            {'id': self.salt.pk, 'name': 'соль', 'amount': 5,
+             'measurement_unit': 'г'},
+        ])
+        response = APIClient().get('/api/recipes/shopping_cart/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_exports(self):
+        self.add(self.bread)
+        self.add(self.cake)
+        url = '/api/recipes/download_shopping_cart/'
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(
+            b''.join(response.streaming_content).startswith(b'%PDF'))
+        response = self.client.get(url, {'format': 'txt'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn('shopping_cart.txt', response['Content-Disposition'])
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(),
+            'Список покупок.\n\n* мука: 100 г\n* сахар: 20 г\n* соль: 15 г\n'
+        )
+        response = self.client.get(url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['name,amount,measurement_unit', 'мука,100,г', 'сахар,20,г',
+             'соль,15,г']
+        )
+        response = self.client.get(url, {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_errors(self):
+        response = APIClient().get('/api/recipes/download_shopping_cart/',
+                                   {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', response.json())
@@ -0,0 +1,148 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            Tag, User)
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .base import (APITestCase, api_client, create_recipe, create_superuser,
+                   create_user)
+
+
+class ConditionalRequestsTestCase(APITestCase):
+    """ETag / Last-Modified и ответы 304."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                     slug='breakfast')
+        cls.salt = Ingredient.objects.create(name='соль',
+                                             measurement_unit='г')
+        cls.recipe = create_recipe(cls.user, 'Рецепт')
+        cls.recipe.tags.add(cls.tag)
+
+    def setUp(self):
+        super().setUp()
+        self.guest = APIClient()
+        self.client = api_client(self.user)
+
+    def assert_not_modified(self, client, url):
+        etag = client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        return etag, len(queries)
+
+    def assert_modified(self, client, url, etag):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_recipes_list_guest(self):
+        url = '/api/recipes/'
+        etag, queries = self.assert_not_modified(self.guest, url)
+        self.assertEqual(queries, 1)
+        self.assertNotIn('Last-Modified', self.guest.get(url))
+        self.recipe.save()
+        self.assert_modified(self.guest, url, etag)
+
+    def test_recipes_list_delete(self):
+        url = '/api/recipes/'
+        deleted = create_recipe(self.user, 'Старый')
+        Recipe.objects.filter(pk=deleted.pk).update(
+            updated_at=self.recipe.updated_at)
+        since = http_date()
+        etag, _ = self.assert_not_modified(self.guest, url)
+        Recipe.objects.filter(pk=deleted.pk).delete()
+        # Удаление не двигает Max(updated_at): список без Last-Modified
+        # и меняется только по ETag.
+        response = self.guest.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 1)
+        self.assert_modified(self.guest, url, etag)
+
+    def test_recipe_detail_tracks_tags(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        etag, _ = self.assert_not_modified(self.guest, url)
+        self.recipe.tags.clear()
+        self.assert_modified(self.guest, url, etag)
+        etag, _ = self.assert_not_modified(self.guest, url)
+        self.tag.recipes.add(self.recipe)
+        self.assert_modified(self.guest, url, etag)
+
+    def test_recipe_tracks_ingredient_rows(self):
+        admin = create_superuser()
+        row = IngredientInRecipe.objects.create(
+            recipes=self.recipe, ingredients=self.salt, amount=1)
+        url = f'/api/recipes/{self.recipe.pk}/'
+        etag, _ = self.assert_not_modified(self.guest, url)
+        self.client.force_login(admin)
+        self.client.post(
+            f'/admin/recipes/ingredientinrecipe/{row.pk}/change/',
+            {'recipes': self.recipe.pk, 'ingredients': self.salt.pk,
+             'amount': 5})
+        self.assert_modified(self.guest, url, etag)
+
+    def test_recipe_tracks_author(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        etag, _ = self.assert_not_modified(self.guest, url)
+        author = User.objects.get(pk=self.user.pk)
+        author.username = 'renamed'
+        author.save(update_fields=['username'])
+        self.assert_modified(self.guest, url, etag)
+        etag, _ = self.assert_not_modified(self.guest, url)
+        author.save(update_fields=['last_login'])
+        self.assert_not_modified(self.guest, url)
+
+    def test_recipes_list_user_relations(self):
+        url = '/api/recipes/'
+        etag, queries = self.assert_not_modified(self.client, url)
+        self.assertEqual(queries, 2)
+        self.assertNotIn('Last-Modified', self.client.get(url))
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        self.assert_modified(self.client, url, etag)
+
+    def test_catalogs(self):
+        for url in ('/api/tags/', f'/api/tags/{self.tag.pk}/',
+                    '/api/ingredients/'):
+            with self.subTest(url=url):
+                etag, queries = self.assert_not_modified(self.guest, url)
+                self.assertEqual(queries, 0)
+        etag = self.guest.get('/api/tags/')['ETag']
+        self.tag.save()
+        self.assert_modified(self.guest, '/api/tags/', etag)
+
+    def test_catalog_cache(self):
+        url = '/api/ingredients/'
+        content = self.guest.get(url).content
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest.get(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.content, content)
+        Ingredient.objects.create(name='перец', measurement_unit='г')
+        self.assertEqual(
+            [item['name'] for item in self.guest.get(url).json()],
+            ['перец', 'соль']
+        )
+
+    def test_ingredient_search(self):
+        url = '/api/ingredients/?name=со'
+        etag, queries = self.assert_not_modified(self.guest, url)
+        self.assertEqual(queries, 0)
+        self.assertEqual([item['name'] for item in self.guest.get(url).json()],
+                         ['соль'])
+        Ingredient.objects.create(name='соус', measurement_unit='г')
+        self.assert_modified(self.guest, url, etag)
+        self.assertEqual([item['name'] for item in self.guest.get(url).json()],
+                         ['соль', 'соус'])
+
+    def test_catalog_cache_json_only(self):
+        url = '/api/tags/'
+        self.client.get(url, HTTP_ACCEPT='text/html')
+        response = self.guest.get(url, HTTP_ACCEPT='text/html')
+        self.assertNotContains(response, self.user.username)
+        self.assertNotIn('ETag', response)
+        self.assertIn('ETag', self.guest.get(url))
@@ -0,0 +1,55 @@
+import io
+
+from django.core.management import call_command
+from django.test import TestCase
+from recipes.models import Favorite, ShoppingCard, Subscription, UserCounter
+
+from .base import create_recipe, create_user
+
+
+class CountersTestCase(TestCase):
+    """Счетчики рецептов и пользователей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.readers = [
+            create_user(f'reader{i}')
+            for i in range(3)
+        ]
+        cls.recipe = create_recipe(cls.author, 'Рецепт')
+
+    def assert_counters(self, favorites, carts, recipes, followers):
+        self.recipe.refresh_from_db()
+        counters = UserCounter.objects.get(user=self.author)
+        self.assertEqual(
+            (self.recipe.favorites_count, self.recipe.carts_count,
+             counters.recipes_count, counters.followers_count),
+            (favorites, carts, recipes, followers)
+        )
+
+    def test_incremental(self):
+        self.assert_counters(0, 0, 1, 0)
+        for reader in self.readers:
+            Favorite.objects.create(user=reader, recipe=self.recipe)
+            ShoppingCard.objects.create(user=reader, recipe=self.recipe)
+            Subscription.objects.create(user=reader, author=self.author)
+        self.assert_counters(3, 3, 1, 3)
+        Favorite.objects.filter(user=self.readers[0]).delete()
+        ShoppingCard.objects.filter(user=self.readers[0]).delete()
+        Subscription.objects.filter(user=self.readers[0]).delete()
+        create_recipe(self.author, 'Второй')
+        self.assert_counters(2, 2, 2, 2)
+
+    def test_recount(self):
+        Favorite.objects.bulk_create(
+            Favorite(user=reader, recipe=self.recipe)
+            for reader in self.readers
+        )
+        Subscription.objects.bulk_create(
+            Subscription(user=reader, author=self.author)
+            for reader in self.readers
+        )
+        UserCounter.objects.filter(user=self.author).delete()
+        call_command('recount_counters', stdout=io.StringIO())
+        self.assert_counters(3, 0, 1, 3)
@@ -0,0 +1,137 @@
+from django.test import override_settings
+from recipes.feed import backfill, rebuild_feed
+from recipes.models import FeedEntry, Subscription, UserCounter
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .base import APITestCase, api_client, create_recipe, create_user
+
+URL = '/api/recipes/feed/'
+
+
+class FeedTestCase(APITestCase):
+    """Лента подписок: раскладка рецептов и выдача по курсору."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.authors = [
+            create_user(f'author{i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.reader)
+
+    def publish(self, author, count=1):
+        return [
+            create_recipe(author, f'Рецепт {author.username} {i}').pk
+            for i in range(count)
+        ]
+
+    def entries(self):
+        return set(FeedEntry.objects.filter(user=self.reader)
+                   .values_list('recipe_id', flat=True))
+
+    def feed(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_fan_out_and_unsubscribe(self):
+        old = self.publish(self.authors[0])
+        Subscription.objects.create(user=self.reader, author=self.authors[0])
+        self.assertEqual(self.entries(), set(old))
+        new = self.publish(self.authors[0])
+        self.publish(self.authors[1])
+        self.assertEqual(self.entries(), set(old + new))
+        Subscription.objects.filter(user=self.reader,
+                                    author=self.authors[0]).get().delete()
+        self.assertEqual(self.entries(), set())
+
+    def test_bulk_subscribe(self):
+        recipes = self.publish(self.authors[0]) + self.publish(self.authors[1])
+        authors = [self.authors[0].pk, self.authors[1].pk]
+        url = '/api/users/subscribe/'
+        response = self.client.post(url, {'ids': authors}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.entries(), set(recipes))
+        response = self.client.delete(url, {'ids': authors[:1]},
+                                      format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.entries(), set(recipes[1:]))
+
+    def test_backfill_no_authors(self):
+        backfill(self.reader.pk, [])
+        self.assertEqual(self.entries(), set())
+
+    @override_settings(FEED_BACKFILL=2)
+    def test_backfill_limit(self):
+        recipes = self.publish(self.authors[0], 3)
+        Subscription.objects.create(user=self.reader, author=self.authors[0])
+        self.assertEqual(self.entries(), set(recipes[1:]))
+
+    def test_cursor_pages(self):
+        Subscription.objects.create(user=self.reader, author=self.authors[0])
+        Subscription.objects.create(user=self.reader, author=self.authors[1])
+        recipes = self.publish(self.authors[0], 3)
+        recipes += self.publish(self.authors[1], 2)
+        self.publish(self.authors[2], 2)
+        data = self.feed(limit=2)
+        self.assertNotIn('count', data)
+        ids = [item['id'] for item in data['results']]
+        while data['next']:
+            response = self.client.get(data['next'])
+            data = response.json()
+            ids.extend(item['id'] for item in data['results'])
+        self.assertEqual(ids, sorted(recipes, reverse=True))
+
+    def pull(self, author):
+        return UserCounter.objects.get(user=author).feed_pull
+
+    def test_popular_author(self):
+        Subscription.objects.create(user=self.reader, author=self.authors[0])
+        Subscription.objects.create(user=self.reader, author=self.authors[1])
+        with override_settings(FEED_FANOUT_LIMIT=1):
+            # Порог снижен без пересборки: решение хранится у автора.
+            recipes = self.publish(self.authors[0], 2)
+            self.assertEqual(self.entries(), set(recipes))
+            rebuild_feed()
+            # У популярных авторов рецепты читаются при запросе ленты.
+            self.assertTrue(self.pull(self.authors[0]))
+            self.assertEqual(self.entries(), set())
+            ids = [item['id'] for item in self.feed()['results']]
+            self.assertEqual(ids, sorted(recipes, reverse=True))
+        rebuild_feed()
+        self.assertFalse(self.pull(self.authors[0]))
+        self.assertEqual(self.entries(), set(recipes))
+
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_cross_limit(self):
+        author, other = self.authors[0], self.authors[1]
+        old = self.publish(author)
+        Subscription.objects.create(user=self.reader, author=author)
+        self.assertFalse(self.pull(author))
+        self.assertEqual(self.entries(), set(old))
+        # Второй подписчик: автор читается при запросе, строки удалены.
+        Subscription.objects.create(user=other, author=author)
+        self.assertTrue(self.pull(author))
+        self.assertFalse(FeedEntry.objects.filter(author=author).exists())
+        pulled = self.publish(author)
+        self.assertFalse(FeedEntry.objects.filter(author=author).exists())
+        ids = [item['id'] for item in self.feed()['results']]
+        self.assertEqual(ids, sorted(old + pulled, reverse=True))
+        # Отписка: автор снова раскладывается, включая рецепты,
+        # опубликованные в режиме чтения.
+        Subscription.objects.filter(user=other, author=author).delete()
+        self.assertFalse(self.pull(author))
+        self.assertEqual(self.entries(), set(old + pulled))
+        new = self.publish(author)
+        self.assertEqual(self.entries(), set(old + pulled + new))
+        ids = [item['id'] for item in self.feed()['results']]
+        self.assertEqual(ids, sorted(old + pulled + new, reverse=True))
+
+    def test_anonymous(self):
+        response = APIClient().get(URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,74 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Favorite, ShoppingCard, Tag
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .base import api_client, create_recipe, create_user
+
+
+class RecipeFilterTestCase(TestCase):
+    """Фильтрация списка рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.author = create_user('author')
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', color='#E26C2D',
+                               slug=f'tag{i}')
+            for i in range(3)
+        ]
+        cls.recipes = []
+        for i in range(6):
+            author = cls.author if i % 2 else cls.user
+            recipe = create_recipe(author, f'Рецепт {i}')
+            recipe.tags.set(cls.tags[:i % 3 + 1])
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[:4]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in cls.recipes[2:]:
+            ShoppingCard.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.guest = APIClient()
+        self.client = api_client(self.user)
+
+    def get_ids(self, client, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/recipes/?limit=100&{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for captured in queries:
+            self.assertNotIn('DISTINCT', captured['sql'])
+        return sorted(item['id'] for item in response.json()['results'])
+
+    def ids(self, recipes):
+        return sorted(recipe.pk for recipe in recipes)
+
+    def test_tags(self):
+        self.assertEqual(self.get_ids(self.guest, 'tags=tag2'),
+                         self.ids(self.recipes[2::3]))
+        self.assertEqual(self.get_ids(self.guest, 'tags=tag1&tags=tag2'),
+                         self.ids(self.recipes[1:3] + self.recipes[4:6]))
+
+    def test_author(self):
+        self.assertEqual(self.get_ids(self.guest, f'author={self.author.pk}'),
+                         self.ids(self.recipes[1::2]))
+
+    def test_relations(self):
+        self.assertEqual(self.get_ids(self.client, 'is_favorited=1'),
+                         self.ids(self.recipes[:4]))
+        self.assertEqual(self.get_ids(self.client, 'is_in_shopping_cart=1'),
+                         self.ids(self.recipes[2:]))
+        self.assertEqual(
+            self.get_ids(self.client,
+                         'is_favorited=1&is_in_shopping_cart=1&tags=tag0'
+                         f'&author={self.author.pk}'),
+            self.ids([self.recipes[3]])
+        )
+
+    def test_guest_relations(self):
+        self.assertEqual(self.get_ids(self.guest, 'is_favorited=1'), [])
+        self.assertEqual(self.get_ids(self.guest, 'is_in_shopping_cart=1'),
+                         [])
@@ -0,0 +1,130 @@
+import base64
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from PIL import Image
+from recipes import images
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework import status
+
+from .base import APITestCase, api_client, create_user
+
+MEDIA_ROOT = tempfile.mkdtemp()
+IMAGE_VARIANTS = {
+    'image_card': (60, 60),
+    'image_thumbnail': (20, 20),
+}
+
+
+def image_data(size=(120, 80), color='red'):
+    """PNG-изображение в виде data URI."""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_VARIANTS=IMAGE_VARIANTS,
+                   IMAGE_VARIANTS_SYNC=True)
+class RecipeImageTestCase(APITestCase):
+    """Загрузка изображений рецептов и их уменьшенные копии."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('author')
+        cls.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                     slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(name='мука',
+                                                   measurement_unit='г')
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+
+    def create_recipe(self, image):
+        return self.client.post('/api/recipes/', {
+            'name': 'Блины', 'text': 'Описание', 'cooking_time': 10,
+            'tags': [self.tag.pk], 'image': image,
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 100}],
+        }, format='json')
+
+    def assert_variant(self, file, size):
+        with default_storage.open(file.name) as stored:
+            image = Image.open(stored)
+            self.assertEqual(image.format, 'WEBP')
+            self.assertLessEqual(image.width, size[0])
+            self.assertLessEqual(image.height, size[1])
+
+    def test_variants_created(self):
+        response = self.create_recipe(image_data())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        self.assertTrue(default_storage.exists(recipe.image.name))
+        for field, size in IMAGE_VARIANTS.items():
+            self.assert_variant(getattr(recipe, field), size)
+
+        detail = self.client.get(f'/api/recipes/{recipe.pk}/').json()
+        self.assertTrue(detail['image'].endswith(recipe.image_card.url))
+        favorite = self.client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        self.assertTrue(
+            favorite.json()['image'].endswith(recipe.image_thumbnail.url))
+
+    def test_variants_replaced(self):
+        recipe_id = self.create_recipe(image_data()).json()['id']
+        old = Recipe.objects.get(pk=recipe_id)
+        response = self.client.patch(f'/api/recipes/{recipe_id}/', {
+            'name': 'Блины', 'text': 'Описание', 'cooking_time': 10,
+            'tags': [self.tag.pk], 'image': image_data(color='blue'),
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 100}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipe = Recipe.objects.get(pk=recipe_id)
+        self.assertNotEqual(recipe.image_card.name, old.image_card.name)
+        self.assertFalse(default_storage.exists(old.image_card.name))
+        self.assertFalse(default_storage.exists(old.image_thumbnail.name))
+        self.assert_variant(recipe.image_card, IMAGE_VARIANTS['image_card'])
+
+    def test_original_until_variants_ready(self):
+        with self.settings(IMAGE_VARIANTS_SYNC=False):
+            response = self.create_recipe(image_data())
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        self.assertFalse(recipe.image_card)
+        detail = self.client.get(f'/api/recipes/{recipe.pk}/').json()
+        self.assertTrue(detail['image'].endswith(recipe.image.url))
+
+    def test_image_replaced_while_rendering(self):
+        with self.settings(IMAGE_VARIANTS_SYNC=False):
+            response = self.create_recipe(image_data())
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        written = [images.variant_name(recipe.image.name, field)
+                   for field in IMAGE_VARIANTS]
+
+        def replace_image(image, size):
+            Recipe.objects.filter(pk=recipe.pk).update(image='recipes/new.png')
+            return render_variant(image, size)
+
+        render_variant = images.render_variant
+        with mock.patch.object(images, 'render_variant', replace_image):
+            images.make_variants(recipe.pk)
+        recipe.refresh_from_db()
+        self.assertFalse(recipe.image_card)
+        for name in written:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_invalid_image(self):
+        for image in ('data:image/png;base64,!!!!',
+                      'data:image/png;base64,'
+                      + base64.b64encode(b'not an image').decode()):
+            response = self.create_recipe(image)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+            self.assertIn('image', response.json())
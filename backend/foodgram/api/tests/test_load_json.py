@@ -0,0 +1,32 @@
+import io
+
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+from recipes.management.commands.load_json import iter_json_array
+
+
+class IterJsonArrayTestCase(SimpleTestCase):
+    """Потоковый разбор JSON-массива в команде load_json."""
+
+    def parse(self, text, **kwargs):
+        return list(iter_json_array(io.StringIO(text), chunk_size=4,
+                                    **kwargs))
+
+    def test_objects_across_chunks(self):
+        self.assertEqual(
+            self.parse('[{"name": "соль"}, {"name": "мука"}]'),
+            [{'name': 'соль'}, {'name': 'мука'}]
+        )
+
+    def test_malformed_object_bounded(self):
+        text = '[{"name": "соль"}, {"name": ' + ' ' * 100 + '"мука" x}' * 50
+        with self.assertRaisesRegex(CommandError, 'смещением 23 байт'):
+            self.parse(text, max_object_size=64)
+
+    def test_malformed_at_end(self):
+        with self.assertRaisesRegex(CommandError, 'смещением 1 байт'):
+            self.parse('[{"name": }]')
+
+    def test_unexpected_end(self):
+        with self.assertRaisesRegex(CommandError, 'смещении 21 байт'):
+            self.parse('[{"name": "соль"}')
@@ -0,0 +1,121 @@
+import threading
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe, Subscription, User
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .. import paginators
+from .base import api_client, create_recipe, create_user, new_recipe
+
+
+class CursorPaginationTestCase(TestCase):
+    """Курсорный режим пагинации."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.authors = [
+            create_user(f'author{i}')
+            for i in range(7)
+        ]
+        for i in range(25):
+            create_recipe(cls.authors[i % 7], f'Рецепт {i}')
+        for author in cls.authors:
+            Subscription.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        self.client = api_client(self.user)
+
+    def walk(self, url):
+        """Пройти все страницы, вернуть id и число запросов на страницу."""
+        ids, queries = [], set()
+        while url:
+            with CaptureQueriesContext(connection) as captured:
+                data = self.client.get(url).json()
+            self.assertNotIn('count', data)
+            queries.add(len(captured))
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+        return ids, queries
+
+    def test_recipes(self):
+        ids, queries = self.walk('/api/recipes/?cursor=&limit=4')
+        self.assertEqual(ids, list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)))
+        self.assertEqual(len(queries), 1)
+
+    def test_users(self):
+        ids, _ = self.walk('/api/users/?cursor=&limit=3')
+        self.assertEqual(ids, list(
+            User.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_subscriptions(self):
+        ids, queries = self.walk(
+            '/api/users/subscriptions/?cursor=&limit=2&recipes_limit=1')
+        self.assertEqual(ids, [author.pk for author in self.authors[::-1]])
+        self.assertEqual(len(queries), 1)
+
+    def test_page_number_by_default(self):
+        data = self.client.get('/api/recipes/?limit=4&page=2').json()
+        self.assertEqual(data['count'], 25)
+        self.assertEqual(len(data['results']), 4)
+
+
+@override_settings(PAGINATION_CONCURRENT_COUNT=True)
+class ConcurrentCountTestCase(TransactionTestCase):
+    """Параллельный COUNT(*) в постраничном режиме.
+
+    Поток счета работает в своем соединении и видит только
+    зафиксированные данные, поэтому тест без обертки в транзакцию.
+    """
+
+    def setUp(self):
+        author = create_user('author')
+        # Без сигналов: обработка изображений после фиксации не нужна.
+        Recipe.objects.bulk_create(
+            new_recipe(author, f'Рецепт {i}')
+            for i in range(7)
+        )
+        self.ids = list(Recipe.objects.values_list('pk', flat=True))
+        self.client = APIClient()
+        self.threads = []
+        count = paginators._count
+
+        def tracked_count(queryset):
+            self.threads.append(threading.current_thread())
+            return count(queryset)
+
+        for patcher in (
+                mock.patch.object(paginators, '_count', tracked_count),
+                mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=60)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_pages(self):
+        results = []
+        for page in (1, 2, 3):
+            data = self.client.get(
+                f'/api/recipes/?limit=3&page={page}').json()
+            self.assertEqual(data['count'], 7)
+            results.extend(item['id'] for item in data['results'])
+        self.assertEqual(results, self.ids)
+        self.assertEqual(len(self.threads), 3)
+        self.assertNotIn(threading.current_thread(), self.threads)
+
+    def test_requires_persistent_connections(self):
+        with mock.patch.dict(connection.settings_dict, CONN_MAX_AGE=0):
+            data = self.client.get('/api/recipes/?limit=3&page=3').json()
+        self.assertEqual(data['count'], 7)
+        self.assertEqual(self.threads, [])
+
+    def test_invalid_pages(self):
+        for page in (4, 0, 'x'):
+            with self.subTest(page=page):
+                response = self.client.get(
+                    f'/api/recipes/?limit=3&page={page}')
+                self.assertEqual(response.status_code,
+                                 status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,106 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework import status
+
+from .. import pdf
+from ..pdf import PDFRenderService, PDFRenderTimeout, PDFServiceUnavailable
+from .base import APITestCase, api_client, create_superuser, create_user
+
+ROWS = [{'name': 'соль', 'amount': 5, 'measure': 'г'}]
+
+
+def slow_render(rows):
+    """Отрисовка дольше таймаута сервиса (выполняется в процессе пула)."""
+    time.sleep(1)
+    return b''
+
+
+def wait_idle(service):
+    # Место в очереди освобождается обратным вызовом после результата.
+    deadline = time.monotonic() + 5
+    while service.stats()['pending'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class PDFRenderServiceTestCase(TestCase):
+    """Пул процессов отрисовки: результат, очередь и таймаут."""
+
+    def make_service(self, **kwargs):
+        service = PDFRenderService(**{
+            'workers': 1, 'max_pending': 2, 'timeout': 10, **kwargs})
+        self.addCleanup(
+            lambda: service.executor and service.executor.shutdown())
+        return service
+
+    def test_render_in_pool(self):
+        service = self.make_service()
+        self.assertTrue(service.render(ROWS).startswith(b'%PDF'))
+        self.assertTrue(service.render([]).startswith(b'%PDF'))
+        wait_idle(service)
+        stats = service.stats()
+        self.assertEqual(stats['rendered'], 2)
+        self.assertEqual(stats['pending'], 0)
+        self.assertIsNotNone(stats['latency_p95_ms'])
+
+    def test_backpressure(self):
+        service = self.make_service(workers=0, max_pending=1)
+        started, release = threading.Event(), threading.Event()
+
+        def blocking_render(rows):
+            started.set()
+            release.wait(5)
+            return b'%PDF'
+
+        with mock.patch.object(pdf, 'render_shopping_list', blocking_render):
+            worker = threading.Thread(target=service.render, args=(ROWS,))
+            worker.start()
+            started.wait(5)
+            with self.assertRaises(PDFServiceUnavailable):
+                service.render(ROWS)
+            release.set()
+            worker.join()
+            self.assertEqual(service.render(ROWS), b'%PDF')
+        stats = service.stats()
+        self.assertEqual((stats['rendered'], stats['rejected']), (2, 1))
+
+    def test_timeout(self):
+        service = self.make_service(timeout=0.2)
+        with mock.patch.object(pdf, 'render_shopping_list', slow_render):
+            with self.assertRaises(PDFRenderTimeout):
+                service.render(ROWS)
+        self.assertEqual(service.stats()['timeouts'], 1)
+
+
+class PDFServiceAPITestCase(APITestCase):
+    """Отказ сервиса в API и статистика для администратора."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.admin = create_superuser()
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+
+    def test_busy(self):
+        service = PDFRenderService(workers=0, max_pending=1, timeout=1)
+        service.slots.acquire()
+        with mock.patch('api.utils.get_pdf_service', return_value=service):
+            response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_stats(self):
+        response = self.client.get('/api/service/pdf/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/service/pdf/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue({'workers', 'pending', 'rendered', 'rejected',
+                         'timeouts', 'latency_p50_ms'} <= set(response.json()))
@@ -0,0 +1,106 @@
+import json
+import re
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import ShoppingCard
+from rest_framework.test import APIClient
+
+from .. import profiling
+from ..profiling import RequestProfile, fingerprint, profiled
+from .base import APITestCase, api_client, create_recipe, create_user
+
+METRIC_RE = re.compile(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?')
+
+
+def parse_server_timing(header):
+    """Метрики заголовка Server-Timing: имя -> (мс, описание)."""
+    return {name: (float(duration), desc)
+            for name, duration, desc in METRIC_RE.findall(header)}
+
+
+@override_settings(PROFILING=True, PROFILING_SLOW_REQUEST_MS=10 ** 6)
+class ProfilingMiddlewareTestCase(APITestCase):
+    """Заголовок Server-Timing и журнал медленных запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.recipes = [
+            create_recipe(cls.user, f'Рецепт {i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/recipes/')
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertTrue({'total', 'view', 'sql', 'serializer'} <= set(metrics))
+        self.assertTrue(metrics['sql'][1].startswith(
+            f'{len(context.captured_queries)} queries'))
+        self.assertLessEqual(metrics['view'][0], metrics['total'][0])
+
+    def test_pdf_section(self):
+        ShoppingCard.objects.create(user=self.user, recipe=self.recipes[0])
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertIn('pdf', parse_server_timing(response['Server-Timing']))
+
+    @override_settings(PROFILING_SLOW_REQUEST_MS=0)
+    def test_slow_request_log(self):
+        with self.assertLogs('api.profiling', 'WARNING') as logs:
+            self.client.get('/api/recipes/?limit=2')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['method'], 'GET')
+        self.assertEqual(record['path'], '/api/recipes/?limit=2')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('serializer', record['sections'])
+        self.assertIsInstance(record['duplicates'], list)
+
+    @override_settings(PROFILING=False)
+    def test_disabled(self):
+        response = APIClient().get('/api/tags/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class RequestProfileTestCase(TestCase):
+    """Отпечатки запросов и участки профиля."""
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) '
+                        "AND name = 'x' LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?'
+        )
+
+    def test_duplicates_and_sections(self):
+        profile = RequestProfile()
+
+        def execute(sql, params, many, context):
+            return None
+
+        profile.execute(execute, 'SELECT 1 FROM t WHERE id = %s', [1],
+                        False, {})
+        profiling._local.profile = profile
+        try:
+            with profiled('serializer'):
+                with profiled('serializer'):
+                    for pk in (2, 3):
+                        profile.execute(
+                            execute, 'SELECT 1 FROM u WHERE id = %s',
+                            [pk], False, {})
+        finally:
+            profiling._local.profile = None
+        self.assertEqual(profile.queries, 3)
+        self.assertEqual(profile.duplicates(),
+                         [('SELECT ? FROM u WHERE id = %s', 2)])
+        # Вложенный участок с тем же именем не учитывается повторно.
+        self.assertEqual(profile.sections['serializer'][1], 2)
+        with profiled('pdf'):
+            pass
+        self.assertNotIn('pdf', profile.sections)
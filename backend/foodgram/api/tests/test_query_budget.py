@@ -0,0 +1,252 @@
+import shutil
+import tempfile
+import time
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCard, Subscription, Tag)
+from recipes.search import recipe_index, update_search_documents
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .base import APITestCase, create_recipe, create_user
+
+# Размеры страниц, на которых число запросов должно совпадать.
+PAGE_SIZES = (1, 5, 20)
+# Предельное время ответа одного запроса, секунды.
+RESPONSE_TIME_BUDGET = 1.0
+MEDIA_ROOT = tempfile.mkdtemp()
+SMALL_GIF = (
+    'data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAI'
+    'BRAA7'
+)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetTestCase(APITestCase):
+    """Бюджет запросов к БД и времени ответа для маршрутов API."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.authors = [
+            create_user(f'author{i}')
+            for i in range(5)
+        ]
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', color='#E26C2D',
+                               slug=f'tag{i}')
+            for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(20)
+        ]
+        cls.recipes = []
+        for i in range(30):
+            recipe = create_recipe(cls.authors[i % 5], f'Рецепт {i}')
+            recipe.tags.set(cls.tags[:1 + i % 3])
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(recipes=recipe, ingredients=ingredient,
+                                   amount=i + 1)
+                for ingredient in cls.ingredients[i % 10:i % 10 + 5]
+            )
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in cls.recipes[::3]:
+            ShoppingCard.objects.create(user=cls.user, recipe=recipe)
+        for author in cls.authors[:4]:
+            Subscription.objects.create(user=cls.user, author=author)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.guest = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def request(self, client, method, url, budget, expected_status, **kwargs):
+        """Выполнить запрос, проверить статус, число запросов и время."""
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, **kwargs)
+            elapsed = time.perf_counter() - started
+        self.assertEqual(response.status_code, expected_status,
+                         f'{method.upper()} {url}')
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{method.upper()} {url}: {len(queries)} запросов '
+            f'при бюджете {budget}'
+        )
+        self.assertLess(elapsed, RESPONSE_TIME_BUDGET,
+                        f'{method.upper()} {url}: {elapsed:.3f} с')
+        return len(queries)
+
+    def assert_flat(self, client, url, budget):
+        """Число запросов не зависит от размера страницы."""
+        separator = '&' if '?' in url else '?'
+        counts = {
+            limit: self.request(client, 'get',
+                                f'{url}{separator}limit={limit}',
+                                budget, status.HTTP_200_OK)
+            for limit in PAGE_SIZES
+        }
+        self.assertEqual(len(set(counts.values())), 1,
+                         f'{url}: число запросов растет со страницей {counts}')
+
+    def test_recipes_list(self):
+        self.assert_flat(self.guest, '/api/recipes/', 5)
+        self.assert_flat(self.client, '/api/recipes/', 7)
+
+    def test_recipes_filters(self):
+        for query in ('author={author}', 'tags=tag1&tags=tag2',
+                      'is_favorited=1', 'is_in_shopping_cart=1',
+                      'is_favorited=1&is_in_shopping_cart=1&tags=tag0'):
+            with self.subTest(query=query):
+                self.assert_flat(
+                    self.client,
+                    '/api/recipes/?' + query.format(
+                        author=self.authors[0].pk),
+                    7
+                )
+
+    def test_recipes_search(self):
+        # Запасной индекс в памяти строится заранее; к списку добавляется
+        # запрос версии рецептов для выдачи и для проверки ETag.
+        update_search_documents()
+        recipe_index.search('рецепт')
+        self.assert_flat(self.guest, '/api/recipes/?search=рецепт', 7)
+        self.assert_flat(self.client, '/api/recipes/?search=рецепт&tags=tag0',
+                         9)
+
+    def test_recipe_detail(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        self.request(self.guest, 'get', url, 4, status.HTTP_200_OK)
+        self.request(self.client, 'get', url, 6, status.HTTP_200_OK)
+
+    def test_recipe_create_update_delete(self):
+        data = {
+            'ingredients': [{'id': ingredient.pk, 'amount': 10}
+                            for ingredient in self.ingredients[:10]],
+            'tags': [tag.pk for tag in self.tags],
+            'image': SMALL_GIF,
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 5,
+        }
+        self.request(self.client, 'post', '/api/recipes/', 13,
+                     status.HTTP_201_CREATED, data=data, format='json')
+        recipe = Recipe.objects.latest('pk')
+        url = f'/api/recipes/{recipe.pk}/'
+        self.request(self.client, 'patch', url, 12, status.HTTP_200_OK,
+                     data=data, format='json')
+        self.request(self.client, 'delete', url, 13,
+                     status.HTTP_204_NO_CONTENT)
+
+    def test_recipe_create_flat(self):
+        """Число запросов не зависит от числа ингредиентов и тегов."""
+        counts = set()
+        for size in (1, 5, 20):
+            data = {
+                'ingredients': [{'id': ingredient.pk, 'amount': 10}
+                                for ingredient in self.ingredients[:size]],
+                'tags': [tag.pk for tag in self.tags[:size]],
+                'image': SMALL_GIF,
+                'name': f'Рецепт из {size} ингредиентов',
+                'text': 'Описание',
+                'cooking_time': 5,
+            }
+            counts.add(self.request(self.client, 'post', '/api/recipes/', 13,
+                                    status.HTTP_201_CREATED, data=data,
+                                    format='json'))
+        self.assertEqual(len(counts), 1, counts)
+
+    def test_favorite(self):
+        url = f'/api/recipes/{self.recipes[1].pk}/favorite/'
+        self.request(self.client, 'post', url, 6, status.HTTP_201_CREATED)
+        self.request(self.client, 'delete', url, 5,
+                     status.HTTP_204_NO_CONTENT)
+
+    def test_shopping_cart(self):
+        url = f'/api/recipes/{self.recipes[1].pk}/shopping_cart/'
+        # Четыре запроса из них - блокировка и пересчет сводки корзины.
+        self.request(self.client, 'post', url, 10, status.HTTP_201_CREATED)
+        self.request(self.client, 'delete', url, 9,
+                     status.HTTP_204_NO_CONTENT)
+
+    def test_bulk_relations(self):
+        recipes = {'ids': [recipe.pk for recipe in self.recipes]}
+        authors = {'ids': [author.pk for author in self.authors]}
+        for url, data, budget in (
+                ('/api/recipes/favorite/', recipes, 7),
+                ('/api/recipes/shopping_cart/', recipes, 11),
+                ('/api/users/subscribe/', authors, 11)):
+            with self.subTest(url=url):
+                self.request(self.client, 'post', url, budget,
+                             status.HTTP_200_OK, data=data, format='json')
+                self.request(self.client, 'delete', url, budget,
+                             status.HTTP_200_OK, data=data, format='json')
+
+    def test_download_shopping_cart(self):
+        url = '/api/recipes/download_shopping_cart/'
+        self.request(self.client, 'get', url, 2, status.HTTP_200_OK)
+        self.request(self.client, 'get', '/api/recipes/shopping_cart/', 2,
+                     status.HTTP_200_OK)
+
+    def test_users(self):
+        self.assert_flat(self.guest, '/api/users/', 2)
+        self.assert_flat(self.client, '/api/users/', 4)
+        self.request(self.client, 'get', '/api/users/me/', 2,
+                     status.HTTP_200_OK)
+        self.request(self.client, 'get',
+                     f'/api/users/{self.authors[0].pk}/', 3,
+                     status.HTTP_200_OK)
+
+    def test_subscriptions(self):
+        self.assert_flat(self.client, '/api/users/subscriptions/', 4)
+        self.assert_flat(self.client,
+                         '/api/users/subscriptions/?recipes_limit=2', 4)
+
+    def test_subscriptions_empty(self):
+        Subscription.objects.filter(user=self.user).delete()
+        self.request(self.client, 'get',
+                     '/api/users/subscriptions/?recipes_limit=3', 4,
+                     status.HTTP_200_OK)
+
+    def test_feed(self):
+        self.assert_flat(self.client, '/api/recipes/feed/', 5)
+
+    def test_subscribe(self):
+        url = f'/api/users/{self.authors[4].pk}/subscribe/'
+        self.request(self.client, 'post', url, 11, status.HTTP_201_CREATED)
+        self.request(self.client, 'delete', url, 7,
+                     status.HTTP_204_NO_CONTENT)
+
+    def test_tags(self):
+        self.request(self.guest, 'get', '/api/tags/', 1, status.HTTP_200_OK)
+        self.request(self.guest, 'get', '/api/tags/', 0, status.HTTP_200_OK)
+        self.request(self.guest, 'get', f'/api/tags/{self.tags[0].pk}/', 1,
+                     status.HTTP_200_OK)
+
+    def test_ingredients(self):
+        self.request(self.guest, 'get', '/api/ingredients/', 1,
+                     status.HTTP_200_OK)
+        self.request(self.guest, 'get', '/api/ingredients/', 0,
+                     status.HTTP_200_OK)
+        self.request(self.guest, 'get', '/api/ingredients/?name=ингр', 1,
+                     status.HTTP_200_OK)
+        self.request(self.guest, 'get', '/api/ingredients/?name=ингр', 0,
+                     status.HTTP_200_OK)
+        self.request(self.guest, 'get',
+                     f'/api/ingredients/{self.ingredients[0].pk}/', 1,
+                     status.HTTP_200_OK)
@@ -0,0 +1,129 @@
+import shutil
+import tempfile
+
+from django.test import override_settings
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from rest_framework import status
+
+from .base import APITestCase, api_client, create_recipe, create_user
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeWriteTestCase(APITestCase):
+    """Изменение ингредиентов и тегов рецепта."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('author')
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', color='#E26C2D',
+                               slug=f'tag{i}')
+            for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(4)
+        ]
+        cls.recipe = create_recipe(cls.user, 'Рецепт')
+        cls.recipe.tags.set(cls.tags[:2])
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipes=cls.recipe, ingredients=ingredient,
+                               amount=10)
+            for ingredient in cls.ingredients[:3]
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = api_client(self.user)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def rows(self):
+        return {
+            row.ingredients_id: (row.pk, row.amount)
+            for row in IngredientInRecipe.objects.filter(recipes=self.recipe)
+        }
+
+    def payload(self, ingredient_ids, tag_ids):
+        return {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'ingredients': [{'id': pk, 'amount': 10}
+                            for pk in ingredient_ids],
+            'tags': tag_ids,
+        }
+
+    def patch(self, ingredients, tags):
+        response = self.client.patch(self.url, {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'ingredients': [{'id': ingredient.pk, 'amount': amount}
+                            for ingredient, amount in ingredients],
+            'tags': [tag.pk for tag in tags],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_missing_ids_reported_together(self):
+        ingredient = self.ingredients[0].pk
+        response = self.client.patch(self.url, self.payload(
+            [ingredient, 9001, 9002], [self.tags[0].pk, 9003, 9004]
+        ), format='json')
+        self.assertEqual(response.status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertIn('9001, 9002', str(errors['ingredients']))
+        self.assertIn('9003, 9004', str(errors['tags']))
+        self.assertEqual(len(self.rows()), 3)
+
+    def test_invalid_tag_ids(self):
+        for tags in ('1', [True], [{'id': 1}], ['x']):
+            response = self.client.patch(
+                self.url, self.payload([self.ingredients[0].pk], tags),
+                format='json')
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST, tags)
+            self.assertIn('tags', response.json())
+
+    def test_unchanged_rows_kept(self):
+        before = self.rows()
+        self.patch([(ingredient, 10) for ingredient in self.ingredients[:3]],
+                   self.tags[:2])
+        self.assertEqual(self.rows(), before)
+
+    def test_ingredients_diff(self):
+        first, second, third, fourth = self.ingredients
+        before = self.rows()
+        data = self.patch([(first, 10), (second, 25), (fourth, 5)],
+                          self.tags[:2])
+        after = self.rows()
+        self.assertEqual(after[first.pk], before[first.pk])
+        self.assertEqual(after[second.pk], (before[second.pk][0], 25))
+        self.assertNotIn(third.pk, after)
+        self.assertEqual(after[fourth.pk][1], 5)
+        self.assertEqual(
+            sorted((item['id'], item['amount'])
+                   for item in data['ingredients']),
+            sorted([(first.pk, 10), (second.pk, 25), (fourth.pk, 5)])
+        )
+
+    def test_tags_diff(self):
+        through = Recipe.tags.through
+        kept = through.objects.get(recipe=self.recipe, tag=self.tags[1]).pk
+        data = self.patch(
+            [(ingredient, 10) for ingredient in self.ingredients[:3]],
+            self.tags[1:]
+        )
+        self.assertEqual(
+            sorted(through.objects.filter(recipe=self.recipe)
+                   .values_list('tag_id', flat=True)),
+            [tag.pk for tag in self.tags[1:]]
+        )
+        self.assertTrue(through.objects.filter(pk=kept).exists())
+        self.assertEqual(sorted(tag['id'] for tag in data['tags']),
+                         [tag.pk for tag in self.tags[1:]])
@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+
+from django.test import override_settings
+from recipes.models import Ingredient, IngredientInRecipe, Tag
+from recipes.search import update_search_documents
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .base import APITestCase, api_client, create_recipe, create_user
+from .test_query_budget import SMALL_GIF
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeSearchTestCase(APITestCase):
+    """Поиск рецептов по названию, описанию, тегам и ингредиентам."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('author')
+        cls.breakfast = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                           slug='breakfast')
+        cls.flour = Ingredient.objects.create(name='мука пшеничная',
+                                              measurement_unit='г')
+        cls.beet = Ingredient.objects.create(name='свекла',
+                                             measurement_unit='г')
+        cls.pancakes = cls.add_recipe(
+            'Блины', 'Тонкие блины на молоке, блины с маслом.', cls.flour)
+        cls.borsch = cls.add_recipe('Борщ', 'Суп со сметаной.', cls.beet)
+        cls.fritters = cls.add_recipe(
+            'Оладьи', 'Пышные, почти как блины.', cls.flour)
+        cls.borsch.tags.set([cls.breakfast])
+        update_search_documents()
+
+    @classmethod
+    def add_recipe(cls, name, text, ingredient):
+        recipe = create_recipe(cls.user, name, text=text)
+        IngredientInRecipe.objects.create(recipes=recipe,
+                                          ingredients=ingredient, amount=100)
+        return recipe
+
+    def setUp(self):
+        super().setUp()
+        self.guest = APIClient()
+
+    def search(self, query, **params):
+        response = self.guest.get('/api/recipes/',
+                                  {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.json()['results']]
+
+    def test_ranked_by_relevance(self):
+        self.assertEqual(self.search('блины'),
+                         [self.pancakes.pk, self.fritters.pk])
+
+    def test_all_words_by_prefix(self):
+        self.assertEqual(self.search('пышн бли'), [self.fritters.pk])
+        self.assertEqual(self.search('пшеничн'),
+                         sorted([self.pancakes.pk, self.fritters.pk],
+                                reverse=True))
+        self.assertEqual(self.search('завтрак'), [self.borsch.pk])
+        self.assertEqual(self.search('пельмени'), [])
+
+    def test_empty_query(self):
+        self.assertEqual(len(self.search('  ,. ')), 3)
+
+    def test_combined_with_filters(self):
+        self.assertEqual(self.search('суп', tags='breakfast'),
+                         [self.borsch.pk])
+        self.assertEqual(self.search('блины', tags='breakfast'), [])
+
+    def test_cursor_pagination(self):
+        response = self.guest.get('/api/recipes/',
+                                  {'search': 'блины', 'cursor': '',
+                                   'limit': 1})
+        first = response.json()
+        second = self.guest.get(first['next']).json()
+        self.assertEqual(
+            [item['id'] for item in first['results'] + second['results']],
+            [self.pancakes.pk, self.fritters.pk]
+        )
+
+    def test_index_follows_changes(self):
+        self.beet.name = 'буряк'
+        self.beet.save()
+        self.assertEqual(self.search('буряк'), [self.borsch.pk])
+        self.borsch.tags.clear()
+        self.assertEqual(self.search('завтрак'), [])
+
+        client = api_client(self.user)
+        response = client.post('/api/recipes/', {
+            'name': 'Сырники', 'text': 'Из творога.', 'cooking_time': 20,
+            'tags': [self.breakfast.pk], 'image': SMALL_GIF,
+            'ingredients': [{'id': self.flour.pk, 'amount': 50}],
+        }, format='json')
+        recipe_id = response.json()['id']
+        self.assertEqual(self.search('творог завтрак'), [recipe_id])
+        client.patch(f'/api/recipes/{recipe_id}/', {
+            'name': 'Сырники', 'text': 'Из творога.', 'cooking_time': 20,
+            'tags': [self.breakfast.pk],
+            'ingredients': [{'id': self.beet.pk, 'amount': 50}],
+        }, format='json')
+        self.assertEqual(self.search('сырники буряк'), [recipe_id])
+        self.assertEqual(self.search('сырники пшеничная'), [])
@@ -0,0 +1,84 @@
+import io
+
+from django.core.management import call_command
+from recipes.models import Ingredient, IngredientInRecipe, SimilarRecipe, Tag
+from recipes.similar import refresh_similar_recipes
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .base import APITestCase, create_recipe, create_user
+
+
+class SimilarRecipesTestCase(APITestCase):
+    """Похожие рецепты: расчет, пересчет измененных и выдача."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.bakery = Tag.objects.create(name='Выпечка', color='#E26C2D',
+                                        slug='bakery')
+        cls.salt, cls.flour, cls.sugar, cls.pepper = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'мука', 'сахар', 'перец')
+        )
+        cls.bread = cls.create('Хлеб', cls.salt, cls.flour, tag=cls.bakery)
+        cls.bun = cls.create('Булка', cls.salt, cls.flour, cls.sugar,
+                             tag=cls.bakery)
+        cls.syrup = cls.create('Сироп', cls.sugar)
+        cls.steak = cls.create('Стейк', cls.pepper)
+
+    @classmethod
+    def create(cls, name, *ingredients, tag=None):
+        recipe = create_recipe(cls.author, name)
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipes=recipe, ingredients=ingredient,
+                               amount=1)
+            for ingredient in ingredients
+        )
+        if tag:
+            recipe.tags.add(tag)
+        return recipe
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def similar(self, recipe):
+        response = self.client.get(f'/api/recipes/{recipe.pk}/similar/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.json()]
+
+    def test_neighbours(self):
+        refresh_similar_recipes(full=True)
+        self.assertEqual(self.similar(self.bread), [self.bun.pk])
+        self.assertEqual(self.similar(self.bun),
+                         [self.bread.pk, self.syrup.pk])
+        self.assertEqual(self.similar(self.steak), [])
+        scores = SimilarRecipe.objects.filter(
+            recipe=self.bun).values_list('score', flat=True)
+        self.assertTrue(all(0 < score <= 1 for score in scores))
+        with self.assertNumQueries(2):
+            self.similar(self.bun)
+        response = self.client.get('/api/recipes/9001/similar/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_incremental(self):
+        self.assertEqual(refresh_similar_recipes(), 4)
+        refreshed = SimilarRecipe.objects.get(
+            recipe=self.bread).computed_at
+        IngredientInRecipe.objects.create(recipes=self.steak,
+                                          ingredients=self.sugar, amount=1)
+        self.steak.save()
+        # Стейк и рецепты с сахаром, хлеб не затронут.
+        self.assertEqual(refresh_similar_recipes(), 3)
+        self.assertIn(self.steak.pk, self.similar(self.syrup))
+        self.assertEqual(self.similar(self.steak)[0], self.syrup.pk)
+        self.assertEqual(
+            SimilarRecipe.objects.get(recipe=self.bread).computed_at,
+            refreshed)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('similar_recipes', '--full', stdout=out)
+        self.assertIn('Пересчитано рецептов: 4.', out.getvalue())
+        self.assertEqual(self.similar(self.syrup), [self.bun.pk])
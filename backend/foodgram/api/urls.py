@@ -14,4 +14,6 @@ router.register('users', views.UserViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('service/pdf/', views.PDFServiceStatsView.as_view(),
+         name='pdf-stats'),
 ]
@@ -1,14 +1,20 @@
-import io
+import hashlib
 
-from django.db import IntegrityError
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from rest_framework import status
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
+from recipes.signals import bulk_relations, relations_bulk_changed
+
+from .pdf import get_pdf_service
+from .profiling import profiled
+from .serializers import BulkIdsSerializer
+
+SHOPPING_CART_PDF_KEY = 'shopping_cart_pdf:{user_id}'
+SHOPPING_CART_PDF_TIMEOUT = 60 * 60 * 24
+
 
 def add_object(serializer, data, context):
     """Добавление объекта."""
@@ -39,31 +45,76 @@ def del_object(model, filters):
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-def generate_pdf_shopping_cart(queryset):
-    """Генерация файла с ингредиентами."""
-    buffer = io.BytesIO()
-    page = canvas.Canvas(buffer, pagesize=A4)
-    pdfmetrics.registerFont(TTFont('FreeSans', 'FreeSans.ttf'))
-    page.setFont('FreeSans', 12)
-    # задаем позицию заголовка от левого нижнего угла
-    position_y = 800
-    position_x = 250
-    page.drawString(position_x, position_y, 'Список покупок.')
-    if not queryset:
-        position_y -= 100  # отступаем от заголовка
-        page.drawString(position_x, position_y,
-                        'Нет ингредиентов для покупок!')
-    else:
-        # задаем координаты для первой строки списка
-        position_x = 50  # на вскидуку отступаем от края листа
-        position_y -= 30  # отступаем от заголовка
-        for ingredient in queryset:
-            position_y -= 15  # отступаем от предыдущей строки
-            page.drawString(position_x, position_y,
-                            f'* {ingredient["name"]}: '
-                            f'{ingredient["amount"]}'
-                            f'{ingredient["measure"]}')
-    page.showPage()
-    page.save()
-    buffer.seek(0)
-    return buffer
+def bulk_objects(request, model, field, targets, forbidden=()):
+    """Пакетное добавление (POST) или удаление (DELETE) связей.
+
+    Связи model текущего пользователя с объектами targets по полю field
+    добавляются одной вставкой с пропуском конфликтов и удаляются одним
+    DELETE в общей транзакции. Для каждого id возвращается результат:
+    created, exists, deleted, not_found или forbidden (id из forbidden).
+    """
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = list(dict.fromkeys(serializer.validated_data['ids']))
+    relations = model.objects.filter(user=request.user,
+                                     **{f'{field}__in': ids})
+    with transaction.atomic():
+        linked = set(relations.values_list(f'{field}_id', flat=True))
+        if request.method == 'POST':
+            found = set(targets.filter(pk__in=ids).values_list('pk',
+                                                               flat=True))
+            changed = found - linked - set(forbidden)
+            model.objects.bulk_create(
+                (model(user=request.user, **{f'{field}_id': pk})
+                 for pk in changed),
+                ignore_conflicts=True,
+            )
+        else:
+            changed = linked
+            # Сигналы строк не нужны: счетчики обновит пакетный сигнал.
+            with bulk_relations():
+                relations.delete()
+        if changed:
+            relations_bulk_changed.send(
+                sender=model, user=request.user, targets=changed,
+                created=request.method == 'POST')
+
+    def result(pk):
+        if request.method == 'DELETE':
+            return 'deleted' if pk in changed else 'not_found'
+        if pk in changed:
+            return 'created'
+        if pk in linked:
+            return 'exists'
+        return 'forbidden' if pk in forbidden else 'not_found'
+
+    return Response({'results': [{'id': pk, 'status': result(pk)}
+                                 for pk in ids]}, status=status.HTTP_200_OK)
+
+
+@profiled('pdf')
+def generate_pdf_shopping_cart(rows):
+    """Файл с ингредиентами, байты PDF (рисуется в пуле процессов)."""
+    return get_pdf_service().render(rows)
+
+
+def get_pdf_shopping_cart(user, queryset):
+    """PDF списка покупок из кэша или свежая отрисовка.
+
+    Кэш хранит отпечаток содержимого корзины, при его расхождении
+    файл перерисовывается.
+    """
+    rows = list(queryset)
+    digest = hashlib.sha1(repr(rows).encode()).hexdigest()
+    key = SHOPPING_CART_PDF_KEY.format(user_id=user.pk)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == digest:
+        return cached[1]
+    pdf = generate_pdf_shopping_cart(rows)
+    cache.set(key, (digest, pdf), SHOPPING_CART_PDF_TIMEOUT)
+    return pdf
+
+
+def drop_pdf_shopping_cart(user_id):
+    """Сброс кэша PDF списка покупок пользователя."""
+    cache.delete(SHOPPING_CART_PDF_KEY.format(user_id=user_id))
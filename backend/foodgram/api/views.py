@@ -1,23 +1,33 @@
-from django.db.models import F, Sum
+import io
+
 from django.http import FileResponse
 from djoser.views import UserViewSet as DjoserUserViewSet
+from recipes.cart import shopping_list
+from recipes.feed import feed_queryset
 from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCard,
-                            Subscription, Tag, User)
+                            ShoppingCartItem, Subscription, Tag, User)
+from recipes.search import ingredient_index
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.permissions import (IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .filters import (AuthorIdFilter, IngredientFilter, IsFavoritedFilter,
-                      IsInShoppingCartFilter, TagsSlugFilter)
-from .paginators import LimitPagePagination
+from .filters import RecipeFilter, RecipeSearchFilter
+from .mixins import CatalogCacheMixin, ConditionalMixin
+from .paginators import LimitCursorPagination, LimitPagePagination
+from .pdf import get_pdf_service
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from .renderers import (CSVShoppingListRenderer, PDFShoppingListRenderer,
+                        PlainTextShoppingListRenderer)
 from .serializers import (FavoriteSerializer, IngredientSerializer,
                           RecipeSerializer, ShoppingCardSerializer,
-                          SubscribeSerializer, TagSerializer)
-from .utils import add_object, del_object, generate_pdf_shopping_cart
+                          ShoppingCartItemSerializer,
+                          SubscribeRecipesSerializer, SubscribeSerializer,
+                          TagSerializer)
+from .utils import add_object, bulk_objects, del_object, get_pdf_shopping_cart
 
 
 class UserViewSet(DjoserUserViewSet):
@@ -42,34 +52,62 @@ class UserViewSet(DjoserUserViewSet):
                               filters=data)
         return None
 
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='subscribe', url_name='subscribe-batch',
+            permission_classes=(IsAuthenticated,))
+    def subscribe_batch(self, request):
+        """Пакетное управление подписками."""
+        return bulk_objects(request, Subscription, 'author',
+                            User.objects.all(), forbidden={request.user.pk})
+
     @action(detail=False, methods=['get'],
             permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
         """Список авторов на которых подписан текущий пользователь."""
-        subscribe = Subscription.objects.filter(user=request.user)
+        subscribe = (
+            Subscription.objects.filter(user=request.user)
+            .select_related('author__counters')
+        )
         page = self.paginate_queryset(subscribe)
+        subscriptions = page if page is not None else subscribe
+        limit = request.GET.get('recipes_limit')
+        # Превью рецептов всех авторов страницы одним запросом.
+        recipes = Recipe.objects.previews(
+            authors=[obj.author_id for obj in subscriptions],
+            limit=int(limit) if limit else None
+        )
+        serializer = SubscribeSerializer(subscriptions, many=True,
+                                         context={'request': request,
+                                                  'recipes': recipes})
         if page is not None:
-            serializer = SubscribeSerializer(page, many=True,
-                                             context={'request': request})
             return self.get_paginated_response(serializer.data)
-        serializer = SubscribeSerializer(subscribe,
-                                         many=True,
-                                         context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Список или один ингредиент (только чтение)."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
-    filter_backends = (IngredientFilter, filters.OrderingFilter)
-    search_fields = ('name',)
+    filter_backends = (filters.OrderingFilter,)
     ordering = ['name']
+    search_param = 'name'
+
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get(self.search_param):
+            return super().list(request, *args, **kwargs)
+        # Ранжированная выдача из индекса проходит через кэш ответов
+        # и ETag справочника, как и полный список.
+        return self.conditional_response(
+            None, self.search, *args, many=True, **kwargs)
+
+    def search(self, request, *args, **kwargs):
+        return Response(ingredient_index.search(
+            request.query_params[self.search_param]))
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Список или один тег (только чтение)."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -77,15 +115,60 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (IsAuthorOrReadOnly,)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalMixin, viewsets.ModelViewSet):
     """Управление рецептами."""
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = LimitPagePagination
-    filter_backends = (AuthorIdFilter, IsFavoritedFilter,
-                       IsInShoppingCartFilter, TagsSlugFilter)
-    filters_fields = ['author', 'is_favorited', 'is_in_shopping_cart', 'tags']
+    filter_backends = (RecipeFilter, RecipeSearchFilter)
+    filters_fields = ['author', 'is_favorited', 'is_in_shopping_cart', 'tags',
+                      'search']
+    user_dependent = True
+    version_models = (User,)
+
+    def get_queryset(self):
+        if self.action == 'destroy':
+            return Recipe.objects.all()
+        return Recipe.objects.for_read(self.request.user)
+
+    def get_validation_queryset(self):
+        return Recipe.objects.all()
+
+    def reload_instance(self, serializer):
+        """Перечитать сохраненный рецепт с предвыборками для ответа."""
+        serializer.instance = Recipe.objects.for_read(
+            self.request.user).get(pk=serializer.instance.pk)
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.reload_instance(serializer)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.reload_instance(serializer)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        """Рецепты авторов из подписок, новые первыми (по курсору)."""
+        queryset = feed_queryset(
+            request.user, self.filter_queryset(self.get_queryset()))
+        paginator = LimitCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Похожие рецепты по ингредиентам и тегам."""
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        queryset = Recipe.objects.filter(
+            similar_for__recipe=recipe
+        ).order_by('-similar_for__score', '-id')
+        serializer = SubscribeRecipesSerializer(
+            queryset, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
 
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=(IsAuthenticated,))
@@ -102,6 +185,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return del_object(Favorite, data)
         return None
 
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='favorite', url_name='favorite-batch',
+            permission_classes=(IsAuthenticated,))
+    def favorite_batch(self, request):
+        """Пакетное управление избранным."""
+        return bulk_objects(request, Favorite, 'recipe', Recipe.objects.all())
+
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=(IsAuthenticated,))
     def shopping_cart(self, request, pk=None):
@@ -118,16 +208,43 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return del_object(model=ShoppingCard, filters=data)
         return None
 
-    @action(detail=False, methods=['get'],
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='shopping_cart', url_name='shopping-cart-batch',
             permission_classes=(IsAuthenticated,))
-    def download_shopping_cart(self, request):
-        """Получить файл со списком покупок"""
-        shopping_card = (
-            request.user.purchase.values(
-                name=F('recipe__ingredients__ingredients__name'),
-                measure=F('recipe__ingredients__ingredients__measurement_unit')
-            ).annotate(amount=Sum('recipe__ingredients__amount'))
+    def shopping_cart_batch(self, request):
+        """Пакетное управление списком покупок."""
+        return bulk_objects(request, ShoppingCard, 'recipe',
+                            Recipe.objects.all())
+
+    @shopping_cart_batch.mapping.get
+    def shopping_cart_preview(self, request):
+        """Список покупок: ингредиенты корзины с общим количеством."""
+        items = (
+            ShoppingCartItem.objects.filter(user=request.user)
+            .select_related('ingredient')
+            .order_by('ingredient__name', 'ingredient__measurement_unit')
         )
-        file_in_buffer = generate_pdf_shopping_cart(queryset=shopping_card)
-        return FileResponse(file_in_buffer, as_attachment=True,
-                            filename='shopping_cart.pdf')
+        return Response(ShoppingCartItemSerializer(items, many=True).data)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=(PDFShoppingListRenderer,
+                              PlainTextShoppingListRenderer,
+                              CSVShoppingListRenderer))
+    def download_shopping_cart(self, request):
+        """Получить файл со списком покупок (?format=pdf|txt|csv)"""
+        rows = shopping_list(request.user)
+        renderer = request.accepted_renderer
+        if isinstance(renderer, PDFShoppingListRenderer):
+            pdf = get_pdf_shopping_cart(user=request.user, queryset=rows)
+            return FileResponse(io.BytesIO(pdf), as_attachment=True,
+                                filename='shopping_cart.pdf')
+        return renderer.streaming_response(rows, 'shopping_cart')
+
+
+class PDFServiceStatsView(APIView):
+    """Состояние сервиса PDF в процессе, обработавшем запрос."""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(get_pdf_service().stats())
@@ -1,6 +1,14 @@
 import os
 
-from django.core.asgi import get_asgi_application
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    from django.core.asgi import get_asgi_application
+except ImportError:  # Django < 3.0
+    raise ImproperlyConfigured(
+        'ASGI-приложение требует Django 3.0 или новее. Используйте '
+        'foodgram.wsgi:application с конфигурацией gunicorn.conf.py.'
+    )
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
@@ -39,6 +39,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Включается PROFILING, должен стоять последним.
+    'api.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -68,16 +70,64 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', None),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', None),
         'HOST': os.getenv('DB_HOST', None),
-        'PORT': os.getenv('DB_PORT', None)
+        'PORT': os.getenv('DB_PORT', None),
+        # Постоянные соединения нужны и потокам параллельного COUNT(*).
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
     }
 }
 
+CATALOG_CACHE_BACKEND = os.getenv(
+    'CATALOG_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Кэш справочников; для нескольких процессов - общий бэкенд,
+    # например django.core.cache.backends.memcached.MemcachedCache.
+    # Кэш в памяти процесса не видит изменений из других процессов,
+    # поэтому версии и ответы в нем живут недолго.
+    'catalog': {
+        'BACKEND': CATALOG_CACHE_BACKEND,
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', 'catalog'),
+        'TIMEOUT': (60 if CATALOG_CACHE_BACKEND.endswith('.LocMemCache')
+                    else 60 * 60 * 24),
+    },
+}
+CATALOG_CACHE = 'catalog'
+
 STATIC_URL = '/backend_static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static/')
 
 MEDIA_URL = '/backend_media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media/')
 
+# Уменьшенные копии изображений рецептов: поле модели и размер в пикселях.
+IMAGE_VARIANTS = {
+    'image_card': (600, 600),
+    'image_thumbnail': (200, 200),
+}
+IMAGE_VARIANT_FORMAT = 'WEBP'
+IMAGE_VARIANT_QUALITY = 80
+# Количество потоков обработки; при IMAGE_VARIANTS_SYNC копии создаются
+# сразу при сохранении рецепта (удобно в тестах и отладке).
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_VARIANTS_SYNC = False
+# Отрисовка PDF списка покупок: число процессов пула (0 - в потоке
+# запроса), предел задач в работе и очереди, время ожидания (секунды).
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', 2))
+PDF_MAX_PENDING = int(os.getenv('PDF_MAX_PENDING', 8))
+PDF_RENDER_TIMEOUT = int(os.getenv('PDF_RENDER_TIMEOUT', 30))
+# Лента подписок: авторы с таким числом подписчиков не раскладывают
+# рецепты по лентам, их рецепты читаются при запросе ленты; число
+# последних рецептов автора, добавляемых в ленту при подписке.
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 10000))
+FEED_BACKFILL = 50
+# Похожие рецепты: число соседей, сохраняемых для каждого рецепта.
+SIMILAR_RECIPES_LIMIT = 10
+# Списки админки: при оценке планировщика PostgreSQL от этого числа строк
+# количество не считается точно.
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -115,6 +165,39 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 TEST_DATA_DIR = os.path.join(BASE_DIR, 'backend_static/data/')
 
+# Поиск ингредиентов: предел выдачи и срок жизни индекса (секунды).
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_INDEX_TTL = 300
+# Поиск рецептов: конфигурация полнотекстового поиска PostgreSQL и предел
+# выдачи запасного индекса в памяти (для SQLite).
+RECIPE_SEARCH_CONFIG = 'russian'
+RECIPE_SEARCH_LIMIT = 1000
+# Наибольшее число id в одном пакетном запросе к избранному, корзине и
+# подпискам.
+BULK_MAX_IDS = 100
+# Считать COUNT(*) страниц параллельно с выборкой строк, в отдельном
+# потоке и соединении с БД. Работает только с постоянными соединениями
+# (DB_CONN_MAX_AGE не 0), иначе счет идет последовательно.
+PAGINATION_CONCURRENT_COUNT = (
+    os.getenv('PAGINATION_CONCURRENT_COUNT', 'False') == 'True')
+PAGINATION_COUNT_WORKERS = int(os.getenv('PAGINATION_COUNT_WORKERS', 4))
+# Профилирование запросов: заголовок Server-Timing и журнал медленных
+# запросов (логгер api.profiling) с самыми частыми повторами SQL.
+PROFILING = os.getenv('PROFILING', 'False') == 'True'
+PROFILING_SLOW_REQUEST_MS = int(os.getenv('PROFILING_SLOW_REQUEST_MS', 500))
+PROFILING_TOP_DUPLICATES = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.profiling': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
@@ -1,19 +1,34 @@
 from django.contrib import admin
 
+from recipes.cart import refresh_recipe_carts
 from recipes.filters import IngredientFilterAdmin
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingCard, Subscription, Tag)
+from recipes.paginators import EstimatedCountPaginator
+from recipes.search import update_search_documents
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Списки без точного подсчета всех строк таблицы.
+
+    Под списком выводится только количество отфильтрованных строк,
+    а для больших таблиц PostgreSQL - его оценка.
+    """
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
 
 
 @admin.register(Subscription)
-class Subscription(admin.ModelAdmin):
+class Subscription(ScalableAdmin):
     list_display = ('pk', 'user', 'author',)
     list_display_links = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
     search_fields = ('user__username', 'author__username',)
 
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(ScalableAdmin):
     list_display = ('pk', 'name', 'color', 'slug',)
     list_display_links = ('pk', 'name')
     prepopulated_fields = {'slug': ('name',)}
@@ -21,7 +36,7 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(ScalableAdmin):
     list_display = ('pk', 'name', 'measurement_unit',)
     list_display_links = ('pk', 'name')
     list_filter = (IngredientFilterAdmin,)
@@ -30,54 +45,97 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 @admin.register(IngredientInRecipe)
-class IngredientInRecipeAdmin(admin.ModelAdmin):
+class IngredientInRecipeAdmin(ScalableAdmin):
     list_display = ['pk', 'recipes', 'ingredients',
                     'measurement_unit', 'amount']
     readonly_fields = ['measurement_unit']
     list_display_links = ('pk', 'recipes', 'ingredients')
+    list_select_related = ('recipes', 'ingredients')
+    autocomplete_fields = ('recipes', 'ingredients')
     search_fields = ('recipes__name', 'ingredients__name')
 
     def measurement_unit(self, obj):
         return obj.ingredients.measurement_unit
     measurement_unit.short_description = 'Единица измерения'
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Строка могла быть перенесена из другого рецепта.
+        recipe_ids = {obj.recipes_id, form.initial.get('recipes')} - {None}
+        update_search_documents(recipe_ids)
+        for recipe_id in recipe_ids:
+            refresh_recipe_carts(recipe_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        update_search_documents([obj.recipes_id])
+        refresh_recipe_carts(obj.recipes_id)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipes_id', flat=True))
+        super().delete_queryset(request, queryset)
+        update_search_documents(recipe_ids)
+        for recipe_id in recipe_ids:
+            refresh_recipe_carts(recipe_id)
+
 
 class IngredientInRecipeInline(admin.TabularInline):
     model = IngredientInRecipe
     list_display = ['pk', 'recipes', 'ingredients',
                     'measurement_unit', 'amount']
     readonly_fields = ['measurement_unit']
+    autocomplete_fields = ('ingredients',)
     extra = 1
     min_num = 1
     max_num = 1
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ingredients')
+
     def measurement_unit(self, obj):
         return obj.ingredients.measurement_unit
     measurement_unit.short_description = 'Единица измерения'
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(ScalableAdmin):
     list_display = ('pk', 'name', 'text', 'cooking_time', 'image', 'author',
                     'favorites')
     list_display_links = ('pk', 'name',)
-    list_filter = ('author', 'name', 'tags', )
+    # Фильтры по автору и названию выводили бы в боковую панель всех
+    # пользователей и все названия; для них есть поиск.
+    list_filter = ('tags', )
+    list_select_related = ('author',)
+    autocomplete_fields = ('author', 'tags')
     search_fields = ('author__username', 'name', 'tags__name')
     empty_value_display = '-пусто-'
     inlines = (IngredientInRecipeInline,)
 
-    @staticmethod
-    def favorites(obj):
-        return obj.favorites.filter(user=obj.author).count()
+    def favorites(self, obj):
+        return obj.favorites_count
+    favorites.short_description = 'В избранном'
+    favorites.admin_order_field = 'favorites_count'
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Ингредиенты из inline сохраняются после рецепта.
+        update_search_documents([form.instance.pk])
+        refresh_recipe_carts(form.instance.pk)
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(ScalableAdmin):
     list_display = ('pk', 'user', 'recipe',)
     list_display_links = ('pk', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
 
 
 @admin.register(ShoppingCard)
-class ShoppingCardAdmin(admin.ModelAdmin):
+class ShoppingCardAdmin(ScalableAdmin):
     list_display = ('pk', 'user', 'recipe',)
     list_display_links = ('pk', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models import F, Sum
+from recipes.models import ShoppingCard, ShoppingCartItem, User
+
+
+def cart_totals(carts):
+    """Суммы ингредиентов по пользователям корзин carts.
+
+    Сортировка модели сбрасывается: поле сортировки попало бы
+    в GROUP BY, и одинаковые ингредиенты разных рецептов не сложились бы.
+    """
+    return (
+        carts.order_by()
+        .values('user_id',
+                ingredient_id=F('recipe__ingredients__ingredients'))
+        .annotate(amount=Sum('recipe__ingredients__amount'))
+    )
+
+
+def refresh_cart_items(user_ids, ingredient_ids=None):
+    """Пересчет сводок корзин пользователей.
+
+    Если заданы ingredient_ids, пересчитываются только эти ингредиенты,
+    остальные строки сводки не затрагиваются. Пересчеты одного
+    пользователя выполняются по очереди: строка пользователя
+    блокируется до конца транзакции, суммы считаются после блокировки.
+    """
+    carts = ShoppingCard.objects.filter(user_id__in=user_ids)
+    items = ShoppingCartItem.objects.filter(user_id__in=user_ids)
+    if ingredient_ids is None:
+        carts = carts.filter(recipe__ingredients__isnull=False)
+    else:
+        carts = carts.filter(
+            recipe__ingredients__ingredients__in=ingredient_ids)
+        items = items.filter(ingredient_id__in=ingredient_ids)
+    # Точка сохранения не нужна: ошибка откатывает и внешнюю транзакцию.
+    with transaction.atomic(savepoint=False):
+        # Блокировка по возрастанию id, чтобы пересчеты не ждали друг друга
+        # по кругу.
+        list(User.objects.select_for_update().filter(pk__in=user_ids)
+             .order_by('pk').values_list('pk', flat=True))
+        rows = list(cart_totals(carts))
+        items.delete()
+        ShoppingCartItem.objects.bulk_create(
+            ShoppingCartItem(**row) for row in rows)
+
+
+def refresh_recipe_carts(recipe_id, ingredient_ids=None):
+    """Пересчет сводок корзин, в которых лежит рецепт.
+
+    Вызывается после изменения ингредиентов рецепта.
+    """
+    user_ids = list(ShoppingCard.objects.filter(recipe_id=recipe_id)
+                    .values_list('user_id', flat=True))
+    if user_ids:
+        refresh_cart_items(user_ids, ingredient_ids)
+
+
+def shopping_list(user):
+    """Список покупок пользователя из сводки, по алфавиту."""
+    return (
+        ShoppingCartItem.objects.filter(user=user)
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+        .values('amount', name=F('ingredient__name'),
+                measure=F('ingredient__measurement_unit'))
+    )
@@ -0,0 +1,36 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import Signal
+
+# Справочник (теги, ингредиенты) изменен, sender - модель.
+catalog_changed = Signal()
+
+VERSION_KEY = 'catalog_version:{label}'
+
+
+def catalog_cache():
+    return caches[settings.CATALOG_CACHE]
+
+
+def get_catalog_version(model):
+    """Текущая версия справочника.
+
+    Версия - случайная метка: после вытеснения ключа из кэша новая
+    метка не совпадет ни с одной из прежних. Метка живет TIMEOUT кэша:
+    у кэша в памяти процесса он короткий, и изменения, сделанные в
+    другом процессе, видны не позже чем через TIMEOUT.
+    """
+    cache = catalog_cache()
+    key = VERSION_KEY.format(label=model._meta.label_lower)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex)
+        return cache.get(key)
+    return version
+
+
+def bump_catalog_version(model):
+    catalog_cache().set(
+        VERSION_KEY.format(label=model._meta.label_lower), uuid4().hex)
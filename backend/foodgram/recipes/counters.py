@@ -0,0 +1,61 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from recipes.models import (Favorite, Recipe, ShoppingCard, Subscription, User,
+                            UserCounter)
+
+
+def _shift(field, delta):
+    return Greatest(F(field) + delta, 0)
+
+
+def change_recipe_counter(recipe_ids, field, delta):
+    """Атомарно изменить счетчик рецептов на delta."""
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        **{field: _shift(field, delta)})
+
+
+def change_user_counter(user_ids, field, delta):
+    """Атомарно изменить счетчик пользователей на delta.
+
+    Пользователи без строки счетчиков получают ее с пересчетом.
+    """
+    user_ids = set(user_ids)
+    updated = UserCounter.objects.filter(user_id__in=user_ids).update(
+        **{field: _shift(field, delta)})
+    if updated < len(user_ids):
+        recount_user_counters(User.objects.filter(
+            pk__in=user_ids, counters__isnull=True))
+
+
+def _count(model, field, outer='pk'):
+    """Подзапрос количества строк model, связанных полем field."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)}).order_by()
+        .values(field).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def recount_recipe_counters(recipes=None):
+    """Пересчет счетчиков рецептов одним UPDATE."""
+    if recipes is None:
+        recipes = Recipe.objects.all()
+    return recipes.update(
+        favorites_count=_count(Favorite, 'recipe'),
+        carts_count=_count(ShoppingCard, 'recipe'),
+    )
+
+
+def recount_user_counters(users=None):
+    """Пересчет счетчиков пользователей, недостающие строки создаются."""
+    if users is None:
+        users = User.objects.all()
+    UserCounter.objects.bulk_create(
+        (UserCounter(user_id=pk)
+         for pk in users.filter(counters__isnull=True)
+         .values_list('pk', flat=True)),
+        ignore_conflicts=True,
+    )
+    return UserCounter.objects.filter(user__in=users).update(
+        recipes_count=_count(Recipe, 'author', outer='user'),
+        followers_count=_count(Subscription, 'author', outer='user'),
+    )
@@ -0,0 +1,143 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import BooleanField, Case, Q, Value, When
+from recipes.models import FeedEntry, Recipe, Subscription, User, UserCounter
+
+# Количество строк ленты в одной вставке.
+FANOUT_BATCH_SIZE = 1000
+
+
+def _pull_authors():
+    """Авторы, чьи рецепты не раскладываются по лентам.
+
+    Признак feed_pull меняется только в sync_authors и rebuild_feed
+    вместе с лентами, поэтому чтение и запись ленты видят одно решение.
+    """
+    return User.objects.filter(counters__feed_pull=True)
+
+
+def _insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, FANOUT_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(recipe):
+    """Разложить новый рецепт по лентам подписчиков автора.
+
+    Подписчики выбираются одним запросом, у популярных авторов выборка
+    пуста: их рецепты читаются при запросе ленты.
+    """
+    followers = Subscription.objects.filter(author=recipe.author_id).exclude(
+        author__in=_pull_authors()).values_list('user_id', flat=True)
+    _insert(
+        FeedEntry(user_id=user_id, recipe_id=recipe.pk,
+                  author_id=recipe.author_id)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_ids):
+    """Добавить в ленту последние рецепты авторов после подписки."""
+    authors = User.objects.filter(pk__in=author_ids).exclude(
+        pk__in=_pull_authors())
+    previews = Recipe.objects.only('id', 'author').previews(
+        authors, settings.FEED_BACKFILL)
+    _insert(
+        FeedEntry(user_id=user_id, recipe_id=recipe.pk, author_id=author_id)
+        for author_id, recipes in previews.items()
+        for recipe in recipes
+    )
+
+
+def _fill_author(author_id):
+    """Разложить последние рецепты автора по лентам всех подписчиков."""
+    recipe_ids = list(
+        Recipe.objects.filter(author_id=author_id).order_by('-id')
+        .values_list('id', flat=True)[:settings.FEED_BACKFILL]
+    )
+    followers = Subscription.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    _insert(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+        for user_id in followers.iterator()
+        for recipe_id in recipe_ids
+    )
+
+
+def sync_authors(author_ids):
+    """Перевести авторов, пересекших FEED_FANOUT_LIMIT, между раскладкой
+    по лентам и чтением при запросе.
+
+    Вызывается после изменения числа подписчиков. Ставший популярным
+    автор сначала помечается, затем его строки удаляются из лент;
+    переставший - сначала раскладывается по лентам, затем помечается.
+    В промежутке рецепты видны обоими путями, без пропусков.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    crossed = UserCounter.objects.filter(
+        Q(feed_pull=False, followers_count__gte=limit)
+        | Q(feed_pull=True, followers_count__lt=limit),
+        user_id__in=author_ids,
+    ).values_list('user_id', 'feed_pull')
+    for author_id, pull in crossed:
+        if pull:
+            _fill_author(author_id)
+            UserCounter.objects.filter(user_id=author_id).update(
+                feed_pull=False)
+        else:
+            UserCounter.objects.filter(user_id=author_id).update(
+                feed_pull=True)
+            FeedEntry.objects.filter(author_id=author_id).delete()
+
+
+def remove(user_id, author_ids):
+    """Убрать из ленты рецепты авторов после отписки."""
+    FeedEntry.objects.filter(user_id=user_id,
+                             author_id__in=author_ids).delete()
+
+
+def feed_queryset(user, queryset):
+    """Рецепты ленты пользователя из выборки queryset.
+
+    Разложенные рецепты дополняются рецептами популярных авторов,
+    на которых подписан пользователь.
+    """
+    condition = Q(pk__in=FeedEntry.objects.filter(user=user)
+                  .values('recipe_id'))
+    popular = list(
+        Subscription.objects.filter(user=user, author__in=_pull_authors())
+        .values_list('author_id', flat=True)
+    )
+    if popular:
+        condition |= Q(author__in=popular)
+    return queryset.filter(condition)
+
+
+def rebuild_feed():
+    """Пересобрать ленты всех пользователей по текущим подпискам.
+
+    Признак популярности авторов пересчитывается по FEED_FANOUT_LIMIT.
+    """
+    UserCounter.objects.update(feed_pull=Case(
+        When(followers_count__gte=settings.FEED_FANOUT_LIMIT,
+             then=Value(True)),
+        default=Value(False),
+        output_field=BooleanField(),
+    ))
+    FeedEntry.objects.all().delete()
+    subscriptions = Subscription.objects.order_by('user_id').values_list(
+        'user_id', 'author_id')
+    user_id, authors = None, []
+    for subscriber, author in subscriptions.iterator():
+        if subscriber != user_id and authors:
+            backfill(user_id, authors)
+            authors = []
+        user_id = subscriber
+        authors.append(author)
+    if authors:
+        backfill(user_id, authors)
@@ -1,4 +1,29 @@
 from django.contrib import admin
+from django.db.models import Count
+from django.db.models.functions import Substr
+
+from recipes.catalog import catalog_cache, get_catalog_version
+from recipes.models import Ingredient
+
+LETTERS_KEY = 'admin_ingredient_letters:{version}'
+
+
+def ingredient_letters():
+    """Первые буквы названий ингредиентов и число ингредиентов на букву.
+
+    Считаются одним GROUP BY и хранятся в кэше до изменения справочника.
+    """
+    cache = catalog_cache()
+    key = LETTERS_KEY.format(version=get_catalog_version(Ingredient))
+    letters = cache.get(key)
+    if letters is None:
+        letters = list(
+            Ingredient.objects.annotate(letter=Substr('name', 1, 1))
+            .order_by('letter').values_list('letter')
+            .annotate(count=Count('pk'))
+        )
+        cache.set(key, letters)
+    return letters
 
 
 class IngredientFilterAdmin(admin.SimpleListFilter):
@@ -6,8 +31,8 @@ class IngredientFilterAdmin(admin.SimpleListFilter):
     parameter_name = 'ингредиенты_категории'
 
     def lookups(self, request, model_admin):
-        pattern = 'абвгдеёжзийклмнопрстуфхцчшщэюя'
-        return [(i, i) for i in pattern]
+        return [(letter, f'{letter} ({count})')
+                for letter, count in ingredient_letters()]
 
     def queryset(self, request, queryset):
         if self.value():
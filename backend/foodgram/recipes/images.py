@@ -0,0 +1,109 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+
+def variant_name(source, field):
+    """Имя файла копии изображения source для поля field."""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    upload_to = Recipe._meta.get_field(field).upload_to
+    extension = settings.IMAGE_VARIANT_FORMAT.lower()
+    return f'{upload_to}{stem}.{extension}'
+
+
+def variants_outdated(recipe):
+    """Копии отсутствуют или сделаны с другого изображения."""
+    if not recipe.image:
+        return False
+    return any(
+        getattr(recipe, field).name != variant_name(recipe.image.name, field)
+        for field in settings.IMAGE_VARIANTS
+    )
+
+
+def render_variant(image, size):
+    """Уменьшенная копия изображения в формате IMAGE_VARIANT_FORMAT."""
+    variant = image.copy()
+    variant.thumbnail(size)
+    has_alpha = (variant.mode in ('RGBA', 'LA', 'PA')
+                 or 'transparency' in variant.info)
+    variant = variant.convert('RGBA' if has_alpha else 'RGB')
+    buffer = io.BytesIO()
+    variant.save(buffer, settings.IMAGE_VARIANT_FORMAT,
+                 quality=settings.IMAGE_VARIANT_QUALITY)
+    return buffer.getvalue()
+
+
+def make_variants(recipe_id):
+    """Создание уменьшенных копий изображения рецепта."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', *settings.IMAGE_VARIANTS).first()
+    if recipe is None or not variants_outdated(recipe):
+        return
+    source = recipe.image.name
+    with recipe.image.open('rb') as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+        updates = {}
+        for field, size in settings.IMAGE_VARIANTS.items():
+            old_file = getattr(recipe, field)
+            name = variant_name(source, field)
+            storage = old_file.storage
+            if old_file.name and old_file.name != name:
+                storage.delete(old_file.name)
+            storage.delete(name)
+            updates[field] = storage.save(
+                name, ContentFile(render_variant(image, size)))
+    # Копии сохраняются, только если изображение не заменили за это время.
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        updated_at=timezone.now(), **updates)
+    if not updated:
+        # Рецепт удален или изображение заменено: копии никому не нужны.
+        for name in updates.values():
+            storage.delete(name)
+
+
+def _make_variants_logged(recipe_id):
+    try:
+        make_variants(recipe_id)
+    except Exception:
+        logger.exception('Не удалось создать копии изображения рецепта %s',
+                         recipe_id)
+
+
+def _run(recipe_id):
+    try:
+        _make_variants_logged(recipe_id)
+    finally:
+        # Соединения с БД у каждого потока свои, закрываем их сами.
+        connections.close_all()
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    """Пул потоков обработки изображений, создается при первом обращении."""
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_WORKERS,
+        thread_name_prefix='recipe-images',
+    )
+
+
+def schedule_variants(recipe):
+    """Поставить создание копий в очередь после фиксации транзакции."""
+    if settings.IMAGE_VARIANTS_SYNC:
+        _make_variants_logged(recipe.pk)
+        return
+    recipe_id = recipe.pk
+    transaction.on_commit(lambda: get_executor().submit(_run, recipe_id))
@@ -1,8 +1,22 @@
 import json
+import os
+import time
+from itertools import islice
 
 from django.apps import apps
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
 from foodgram import settings
+from recipes.catalog import catalog_changed
+
+# Размер куска файла, читаемого за раз.
+CHUNK_SIZE = 64 * 1024
+# Наибольший размер одного элемента массива: недоразобранный хвост
+# больше этого размера означает ошибку в файле, а не недочитанный объект.
+MAX_OBJECT_SIZE = 1024 * 1024
+# Разделители между элементами JSON-массива.
+SEPARATORS = ' \t\r\n,'
 
 
 def application_existence_check(app_name):
@@ -21,25 +35,108 @@ def model_existence_check(app_class, model_name):
     raise LookupError('Указанная модель в приложении не найдена')
 
 
-def read_json(file):
-    with open(file, "r") as read_file:
-        data = json.load(read_file)
-        return data
+def iter_json_array(file, chunk_size=CHUNK_SIZE,
+                    max_object_size=MAX_OBJECT_SIZE):
+    """Потоковый разбор JSON-массива объектов.
+
+    Файл читается кусками, в памяти держится только недоразобранный
+    хвост буфера. Если хвост не разбирается и длиннее max_object_size
+    или файл закончился, разбор прерывается с указанием смещения
+    в байтах, с которого начинается ошибочный элемент.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    offset = 0  # смещение начала буфера в файле, в байтах
+    started = False
+    while True:
+        chunk = file.read(chunk_size)
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in SEPARATORS:
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise CommandError('Файл должен содержать JSON-массив.')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                obj, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as error:
+                if not chunk or len(buffer) - position > max_object_size:
+                    start = offset + len(buffer[:position].encode())
+                    raise CommandError(
+                        f'Ошибка JSON в элементе со смещением {start} байт: '
+                        f'{error.msg}.'
+                    )
+                break  # объект дочитаем со следующим куском
+            yield obj
+        offset += len(buffer[:position].encode())
+        buffer = buffer[position:]
+        if not chunk:
+            raise CommandError(
+                f'Неожиданный конец JSON-файла на смещении {offset} байт.')
+
+
+def batches(iterable, size):
+    """Разбиение потока на пачки."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
 
 
-def create_objects(model, data):
-    try:
-        i = model.objects.latest('pk').pk
-    except model.DoesNotExist:
-        i = 0
-    objs = []
-    for valums in data:
-        i += 1
-        objs.append(model(id=i, **valums))
-        if len(objs) == 99:
-            crt = model.objects.bulk_create(objs, len(data))
-            objs = []
-    return model.objects.bulk_create(objs, len(data))
+def save_batch(model, batch, keys, update):
+    """Сохранение пачки записей в одной транзакции.
+
+    Записи сопоставляются с существующими по естественному ключу keys.
+    Возвращает количество созданных, обновленных и пропущенных записей.
+    """
+    records = {}
+    for record in batch:
+        records[tuple(record[key] for key in keys)] = record
+    existing = {
+        tuple(getattr(obj, key) for key in keys): obj
+        for obj in model.objects.filter(**{
+            f'{keys[0]}__in': {natural_key[0] for natural_key in records}
+        })
+    }
+    new_objs, changed_objs, fields = [], [], set()
+    for natural_key, record in records.items():
+        obj = existing.get(natural_key)
+        if obj is None:
+            new_objs.append(model(**record))
+            continue
+        if not update:
+            continue
+        changed = {name: value for name, value in record.items()
+                   if getattr(obj, name) != value}
+        if changed:
+            for name, value in changed.items():
+                setattr(obj, name, value)
+            fields.update(changed)
+            changed_objs.append(obj)
+    if changed_objs:
+        # bulk_update не заполняет поля auto_now, заполняем сами.
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                for obj in changed_objs:
+                    setattr(obj, field.attname, now)
+                fields.add(field.name)
+    with transaction.atomic():
+        model.objects.bulk_create(new_objs)
+        if changed_objs:
+            model.objects.bulk_update(changed_objs, fields)
+    created, updated = len(new_objs), len(changed_objs)
+    return created, updated, len(batch) - created - updated
 
 
 class Command(BaseCommand):
@@ -49,15 +146,51 @@ class Command(BaseCommand):
         parser.add_argument('app', type=str, help='Приложение')
         parser.add_argument('model', type=str, help='Модель')
         parser.add_argument('filename', type=str, help='Файл')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество записей в одной транзакции',
+        )
+        parser.add_argument(
+            '--key', nargs='+', default=None,
+            help='Поля естественного ключа (по умолчанию все поля записи)',
+        )
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Обновлять существующие записи вместо пропуска',
+        )
 
     def handle(self, *args, **options):
         """Обработчик команды"""
         app_class = application_existence_check(options['app'])
         model_class = model_existence_check(app_class, options['model'])
-        file_path = (
-            settings.TEST_DATA_DIR
-            + (options['filename'] or (options['model'] + '.json'))
+        file_path = os.path.join(
+            settings.TEST_DATA_DIR,
+            options['filename'] or (options['model'] + '.json')
         )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
 
-        data = read_json(file_path)
-        create_objects(model_class, data)
+        total = created = updated = skipped = 0
+        started = time.monotonic()
+        with open(file_path, 'r') as read_file:
+            for batch in batches(iter_json_array(read_file),
+                                 options['batch_size']):
+                keys = options['key'] or sorted(batch[0])
+                batch_created, batch_updated, batch_skipped = save_batch(
+                    model_class, batch, keys, options['update']
+                )
+                total += len(batch)
+                created += batch_created
+                updated += batch_updated
+                skipped += batch_skipped
+                rate = total / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f'Обработано {total}: создано {created}, '
+                    f'обновлено {updated}, пропущено {skipped} '
+                    f'({rate:.0f} записей/с)'
+                )
+        # bulk_create не отправляет сигналы, сообщаем об изменении сами.
+        catalog_changed.send(sender=model_class)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загрузка завершена за {time.monotonic() - started:.1f} с.'
+        ))
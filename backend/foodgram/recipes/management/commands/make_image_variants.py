@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from recipes.images import make_variants, variants_outdated
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать копии для всех рецептов',
+        )
+
+    def handle(self, *args, **options):
+        """Обработчик команды"""
+        recipes = Recipe.objects.only(
+            'image', *settings.IMAGE_VARIANTS).iterator()
+        done = 0
+        for recipe in recipes:
+            if options['all']:
+                Recipe.objects.filter(pk=recipe.pk).update(
+                    **dict.fromkeys(settings.IMAGE_VARIANTS, ''))
+            elif not variants_outdated(recipe):
+                continue
+            try:
+                make_variants(recipe.pk)
+            except OSError as error:
+                self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+                continue
+            done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {done}.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from recipes.feed import rebuild_feed
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Пересборка лент подписок по текущим подпискам'
+
+    def handle(self, *args, **options):
+        """Обработчик команды"""
+        rebuild_feed()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {FeedEntry.objects.count()}.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from recipes.search import update_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Пересборка поисковых документов рецептов'
+
+    def handle(self, *args, **options):
+        """Обработчик команды"""
+        updated = update_search_documents()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated}.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.counters import recount_recipe_counters, recount_user_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков рецептов и пользователей'
+
+    def handle(self, *args, **options):
+        """Обработчик команды"""
+        with transaction.atomic():
+            recipes = recount_recipe_counters()
+            users = recount_user_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {recipes}, пользователей: {users}.'
+        ))
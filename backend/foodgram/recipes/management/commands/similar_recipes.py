@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes.similar import refresh_similar_recipes
+
+
+class Command(BaseCommand):
+    help = ('Расчет похожих рецептов по ингредиентам и тегам '
+            '(по умолчанию только для измененных рецептов)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все рецепты',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество рецептов в одной транзакции',
+        )
+
+    def handle(self, *args, **options):
+        """Обработчик команды"""
+        if options['batch_size'] < 1:
+            raise CommandError('Параметры должны быть больше нуля.')
+        refreshed = refresh_similar_recipes(
+            full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {refreshed}.'))
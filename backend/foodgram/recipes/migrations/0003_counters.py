@@ -0,0 +1,68 @@
+# Generated by Django 2.2.28 on 2026-10-17 05:54
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    """Начальные значения счетчиков для существующих данных."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCard = apps.get_model('recipes', 'ShoppingCard')
+    Subscription = apps.get_model('recipes', 'Subscription')
+    UserCounter = apps.get_model('recipes', 'UserCounter')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    def count(model, field, outer='pk'):
+        return Coalesce(models.Subquery(
+            model.objects.filter(**{field: models.OuterRef(outer)})
+            .order_by().values(field)
+            .annotate(count=models.Count('pk')).values('count')
+        ), 0)
+
+    Recipe.objects.update(favorites_count=count(Favorite, 'recipe'),
+                          carts_count=count(ShoppingCard, 'recipe'))
+    UserCounter.objects.bulk_create(
+        UserCounter(user_id=pk)
+        for pk in User.objects.values_list('pk', flat=True)
+    )
+    UserCounter.objects.update(
+        recipes_count=count(Recipe, 'author', outer='user'),
+        followers_count=count(Subscription, 'author', outer='user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0002_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.CreateModel(
+            name='UserCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipes_count', models.PositiveIntegerField(default=0, verbose_name='Рецептов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Счетчики пользователя',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
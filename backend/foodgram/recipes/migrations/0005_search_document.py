@@ -0,0 +1,62 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import migrations, models
+
+INDEX_NAME = 'recipes_recipe_search_idx'
+
+
+def fill_search_documents(apps, schema_editor):
+    """Поисковые документы для существующих рецептов."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    tags = defaultdict(list)
+    for recipe_id, name in Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag__name'):
+        tags[recipe_id].append(name)
+    ingredients = defaultdict(list)
+    for recipe_id, name in IngredientInRecipe.objects.values_list(
+            'recipes_id', 'ingredients__name'):
+        ingredients[recipe_id].append(name)
+    recipes = [
+        Recipe(pk=pk, search_document='\n'.join([
+            name, ' '.join(tags[pk]), ' '.join(ingredients[pk]), text
+        ]))
+        for pk, name, text in Recipe.objects.values_list('pk', 'name', 'text')
+    ]
+    Recipe.objects.bulk_update(recipes, ['search_document'], batch_size=500)
+
+
+def create_search_index(apps, schema_editor):
+    """GIN-индекс полнотекстового поиска, только для PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX {INDEX_NAME} ON recipes_recipe USING GIN '
+        f"(to_tsvector(%s::regconfig, COALESCE(search_document, '')))",
+        [settings.RECIPE_SEARCH_CONFIG]
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.RunPython(fill_search_documents,
+                             migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.28 on 2026-10-17 06:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_cart_items(apps, schema_editor):
+    """Сводки корзин для существующих данных."""
+    ShoppingCard = apps.get_model('recipes', 'ShoppingCard')
+    ShoppingCartItem = apps.get_model('recipes', 'ShoppingCartItem')
+    rows = (
+        ShoppingCard.objects.filter(recipe__ingredients__isnull=False)
+        .order_by()
+        .values('user_id',
+                ingredient_id=models.F('recipe__ingredients__ingredients'))
+        .annotate(amount=models.Sum('recipe__ingredients__amount'))
+    )
+    ShoppingCartItem.objects.bulk_create(
+        (ShoppingCartItem(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0005_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='recipes.Ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Сводка корзины',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_cart_item'),
+        ),
+        migrations.RunPython(fill_cart_items, migrations.RunPython.noop),
+    ]
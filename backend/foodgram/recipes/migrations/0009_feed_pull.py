@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-17 06:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pull_authors(apps, schema_editor):
+    """Авторы, не разложенные по лентам в 0007, читаются при запросе."""
+    UserCounter = apps.get_model('recipes', 'UserCounter')
+    UserCounter.objects.filter(
+        followers_count__gte=settings.FEED_FANOUT_LIMIT
+    ).update(feed_pull=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounter',
+            name='feed_pull',
+            field=models.BooleanField(default=False, verbose_name='Рецепты читаются при запросе ленты'),
+        ),
+        migrations.RunPython(mark_pull_authors, migrations.RunPython.noop),
+    ]
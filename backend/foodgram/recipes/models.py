@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, RegexValidator
+from django.core.exceptions import EmptyResultSet
 from django.db import models
+from django.db.models.functions import RowNumber
 
 User = get_user_model()
 
@@ -33,6 +35,11 @@ class Tag(models.Model):
             ),
         ],
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения',
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -56,6 +63,11 @@ class Ingredient(models.Model):
         max_length=200,
         verbose_name='Единица измерения',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения',
+    )
 
     class Meta:
         verbose_name = 'Ингредиент'
@@ -103,6 +115,80 @@ class IngredientInRecipe(models.Model):
         ]
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Выборки рецептов."""
+
+    def with_related(self):
+        """Подгрузить автора, теги и ингредиенты рецептов."""
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'ingredients',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredients')
+            ),
+        )
+
+    def with_user_flags(self, user):
+        """Добавить признаки избранного, корзины и подписки на автора."""
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()),
+                is_author_subscribed=models.Value(
+                    False, output_field=models.BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(user=user,
+                                        recipe=models.OuterRef('pk'))
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCard.objects.filter(user=user,
+                                            recipe=models.OuterRef('pk'))
+            ),
+            is_author_subscribed=models.Exists(
+                Subscription.objects.filter(user=user,
+                                            author=models.OuterRef('author'))
+            ),
+        )
+
+    def for_read(self, user):
+        """Выборка для чтения с фиксированным числом запросов."""
+        return self.with_related().with_user_flags(user)
+
+    def previews(self, authors, limit=None):
+        """Последние limit рецептов каждого из авторов одним запросом.
+
+        Возвращает словарь {id автора: [рецепты]}.
+        """
+        queryset = self.filter(author__in=authors)
+        if limit is not None:
+            # Нумерация рецептов внутри автора, отсечение во внешнем запросе.
+            try:
+                sql, params = queryset.annotate(
+                    row_num=models.Window(
+                        expression=RowNumber(),
+                        partition_by=[models.F('author')],
+                        order_by=models.F('id').desc(),
+                    )
+                ).query.sql_with_params()
+            except EmptyResultSet:
+                # Пустой список авторов: запрос заведомо без строк.
+                return {}
+            queryset = self.raw(
+                f'SELECT * FROM ({sql}) ranked '
+                'WHERE ranked.row_num <= %s ORDER BY ranked.id DESC',
+                (*params, limit)
+            )
+        previews = {}
+        for recipe in queryset:
+            previews.setdefault(recipe.author_id, []).append(recipe)
+        return previews
+
+
 class Recipe(models.Model):
     """Модель 'Рецепт'"""
     name = models.CharField(
@@ -120,6 +206,18 @@ class Recipe(models.Model):
         upload_to='recipes/',
         verbose_name='Изображение',
     )
+    image_card = models.ImageField(
+        upload_to='recipes/card/',
+        blank=True,
+        editable=False,
+        verbose_name='Изображение для карточки',
+    )
+    image_thumbnail = models.ImageField(
+        upload_to='recipes/thumbnail/',
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра',
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -131,6 +229,30 @@ class Recipe(models.Model):
         related_name='recipes',
         verbose_name='Теги',
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name='В избранном',
+    )
+    carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах',
+    )
+    search_document = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Поисковый документ',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -206,6 +328,38 @@ class ShoppingCard(models.Model):
         ]
 
 
+class ShoppingCartItem(models.Model):
+    """Модель 'Сводка корзины': сумма ингредиента по рецептам корзины.
+
+    Поддерживается при изменении корзины и ингредиентов рецептов
+    (recipes.cart), список покупок читается из нее одним запросом.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_items',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+
+    class Meta:
+        verbose_name = 'Сводка корзины'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_cart_item',
+            ),
+        ]
+
+
 class Subscription(models.Model):
     """Модель 'Подписчики'"""
     user = models.ForeignKey(
@@ -240,3 +394,102 @@ class Subscription(models.Model):
             models.Index(fields=['author', ]),
             models.Index(fields=['user', 'author', ]),
         ]
+
+
+class FeedEntry(models.Model):
+    """Модель 'Лента': рецепт автора в ленте подписчика.
+
+    Заполняется при публикации рецепта и при подписке (recipes.feed).
+    Рецепты авторов с очень большим числом подписчиков в ленту не
+    раскладываются и читаются из их рецептов напрямую.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+
+    class Meta:
+        verbose_name = 'Лента'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'author', ]),
+        ]
+
+
+class SimilarRecipe(models.Model):
+    """Модель 'Похожий рецепт': сосед рецепта по ингредиентам и тегам.
+
+    Заполняется командой similar_recipes (recipes.similar).
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_for',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+    computed_at = models.DateTimeField(
+        db_index=True,
+        verbose_name='Дата расчета',
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe',
+            ),
+        ]
+
+
+class UserCounter(models.Model):
+    """Модель 'Счетчики пользователя'"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков',
+    )
+    feed_pull = models.BooleanField(
+        default=False,
+        verbose_name='Рецепты читаются при запросе ленты',
+    )
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
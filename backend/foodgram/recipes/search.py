@@ -0,0 +1,238 @@
+import math
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import Case, Count, FloatField, Max, Value, When
+from django.utils import timezone
+
+from recipes.catalog import get_catalog_version
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+
+# Символ больше любого другого: верхняя граница диапазона префикса.
+MAX_CHAR = '\U0010ffff'
+WORD_RE = re.compile(r'\w+')
+
+
+def trigrams(text):
+    """Множество триграмм строки."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def tokenize(text):
+    """Слова строки в нижнем регистре."""
+    return WORD_RE.findall(text.casefold())
+
+
+def build_search_document(name, text, tags, ingredients):
+    """Поисковый документ рецепта: название, теги, ингредиенты, описание."""
+    return '\n'.join([name, ' '.join(tags), ' '.join(ingredients), text])
+
+
+def update_search_documents(recipe_ids=None, batch_size=500):
+    """Пересборка поисковых документов рецептов по данным БД.
+
+    Нужна там, где состав рецепта меняется в обход сериализатора:
+    в админке, при переименовании тегов и ингредиентов.
+    """
+    recipes = Recipe.objects.order_by('pk')
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    rows = list(recipes.values_list('pk', 'name', 'text'))
+    updated = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        ids = [pk for pk, _, _ in batch]
+        tags = defaultdict(list)
+        for recipe_id, name in Recipe.tags.through.objects.filter(
+                recipe_id__in=ids).values_list('recipe_id', 'tag__name'):
+            tags[recipe_id].append(name)
+        ingredients = defaultdict(list)
+        for recipe_id, name in IngredientInRecipe.objects.filter(
+                recipes_id__in=ids).values_list('recipes_id',
+                                                'ingredients__name'):
+            ingredients[recipe_id].append(name)
+        now = timezone.now()
+        Recipe.objects.bulk_update([
+            Recipe(pk=pk, updated_at=now,
+                   search_document=build_search_document(
+                       name, text, tags[pk], ingredients[pk]))
+            for pk, name, text in batch
+        ], ['search_document', 'updated_at'])
+        updated += len(batch)
+    return updated
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Ищет по префиксу (бинарный поиск по отсортированным названиям),
+    затем по подстроке (через триграммы). Строится при первом поиске,
+    перестраивается при смене версии справочника ингредиентов и
+    по истечении INGREDIENT_INDEX_TTL секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._built_at = 0
+        self._version = None
+
+    def invalidate(self):
+        self._data = None
+
+    def _build(self):
+        items = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda item: (item['name'].casefold(), item['id'])
+        )
+        names = [item['name'].casefold() for item in items]
+        index = defaultdict(list)
+        for position, name in enumerate(names):
+            for trigram in trigrams(name):
+                index[trigram].append(position)
+        return items, names, dict(index)
+
+    def _get_data(self):
+        version = get_catalog_version(Ingredient)
+        with self._lock:
+            age = time.monotonic() - self._built_at
+            if (self._data is None or self._version != version
+                    or age > settings.INGREDIENT_INDEX_TTL):
+                self._data = self._build()
+                self._built_at = time.monotonic()
+                self._version = version
+            return self._data
+
+    def search(self, query, limit=None):
+        """Ингредиенты по запросу: сначала совпадения по префиксу."""
+        limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+        query = query.strip().casefold()
+        items, names, index = self._get_data()
+        if not query:
+            return items[:limit]
+        start = bisect_left(names, query)
+        end = bisect_left(names, query + MAX_CHAR, lo=start)
+        found = list(range(start, min(end, start + limit)))
+        if len(found) < limit:
+            if len(query) < 3:
+                candidates = range(len(names))
+            else:
+                postings = sorted(
+                    (index.get(trigram, []) for trigram in trigrams(query)),
+                    key=len
+                )
+                candidates = sorted(set(postings[0]).intersection(
+                    *postings[1:]))
+            for position in candidates:
+                if start <= position < end or query not in names[position]:
+                    continue
+                found.append(position)
+                if len(found) == limit:
+                    break
+        return [items[position] for position in found]
+
+
+class RecipeIndex:
+    """Обратный индекс поисковых документов рецептов в памяти процесса.
+
+    Запасной вариант поиска для СУБД без полнотекстового поиска (SQLite
+    в тестах и разработке). Слова запроса ищутся по префиксу, рецепт
+    должен содержать все слова, вес - сумма tf-idf найденных слов.
+    Перестраивается при изменении числа рецептов или их даты изменения.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+
+    def invalidate(self):
+        self._data = None
+
+    def _build(self):
+        postings = defaultdict(dict)
+        documents = Recipe.objects.values_list('pk', 'search_document')
+        for pk, document in documents.iterator():
+            for word, count in Counter(tokenize(document)).items():
+                postings[word][pk] = count
+        return sorted(postings), dict(postings), documents.count()
+
+    def _get_data(self):
+        version = Recipe.objects.aggregate(
+            count=Count('pk'), updated=Max('updated_at'))
+        with self._lock:
+            if self._data is None or self._version != version:
+                self._data = self._build()
+                self._version = version
+            return self._data
+
+    def _word_scores(self, word, vocabulary, postings, total):
+        scores = defaultdict(float)
+        start = bisect_left(vocabulary, word)
+        end = bisect_left(vocabulary, word + MAX_CHAR, lo=start)
+        for token in vocabulary[start:end]:
+            documents = postings[token]
+            idf = math.log(1 + total / len(documents))
+            for pk, count in documents.items():
+                scores[pk] += count * idf
+        return scores
+
+    def search(self, query, limit=None):
+        """Пары (id рецепта, вес) по убыванию веса."""
+        limit = limit or settings.RECIPE_SEARCH_LIMIT
+        words = set(tokenize(query))
+        if not words:
+            return []
+        vocabulary, postings, total = self._get_data()
+        scores = None
+        for word in words:
+            word_scores = self._word_scores(word, vocabulary, postings,
+                                            total)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {pk: score + word_scores[pk]
+                          for pk, score in scores.items()
+                          if pk in word_scores}
+            if not scores:
+                return []
+        return sorted(scores.items(),
+                      key=lambda item: (-item[1], -item[0]))[:limit]
+
+
+def search_recipes(queryset, query):
+    """Рецепты по поисковому запросу, упорядоченные по релевантности.
+
+    В PostgreSQL - полнотекстовый поиск по индексу GIN, в остальных
+    СУБД - поиск по индексу в памяти. Вес попадает в search_rank.
+    """
+    words = tokenize(query)
+    if not words:
+        return queryset
+    if connections[queryset.db].vendor == 'postgresql':
+        search_query = SearchQuery(
+            ' & '.join(f'{word}:*' for word in words),
+            config=settings.RECIPE_SEARCH_CONFIG, search_type='raw')
+        vector = SearchVector('search_document',
+                              config=settings.RECIPE_SEARCH_CONFIG)
+        return queryset.annotate(
+            search=vector, search_rank=SearchRank(vector, search_query)
+        ).filter(search=search_query).order_by('-search_rank', '-id')
+    ranked = recipe_index.search(query)
+    if not ranked:
+        return queryset.none()
+    rank = Case(*(When(pk=pk, then=Value(score)) for pk, score in ranked),
+                output_field=FloatField())
+    return queryset.filter(pk__in=[pk for pk, _ in ranked]).annotate(
+        search_rank=rank).order_by('-search_rank', '-id')
+
+
+ingredient_index = IngredientIndex()
+recipe_index = RecipeIndex()
@@ -0,0 +1,267 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import Signal, receiver
+
+from recipes import feed
+from recipes.cart import refresh_cart_items
+from recipes.catalog import bump_catalog_version, catalog_changed
+from recipes.counters import (change_recipe_counter, change_user_counter,
+                              recount_recipe_counters, recount_user_counters)
+from recipes.images import schedule_variants, variants_outdated
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCard, Subscription, Tag, User, UserCounter)
+from recipes.search import ingredient_index, update_search_documents
+
+# Пакетное изменение связей пользователя (избранное, корзина, подписки)
+# в обход сигналов модели: sender - модель связи, user - пользователь,
+# targets - id рецептов или авторов, created - добавлены или удалены.
+relations_bulk_changed = Signal(providing_args=['user', 'targets', 'created'])
+# Поля пользователя, которые выводятся в рецептах как автор.
+AUTHOR_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+
+_bulk = threading.local()
+# id рецептов, которые удаляются в потоке вместе с корзинами.
+_deleting = threading.local()
+
+
+@contextmanager
+def bulk_relations():
+    """Пакетное изменение связей в потоке.
+
+    Сигналы отдельных строк связей пропускаются: изменения целиком
+    обрабатывают получатели relations_bulk_changed.
+    """
+    _bulk.active = True
+    try:
+        yield
+    finally:
+        _bulk.active = False
+
+
+def per_row(handler):
+    """Получатель сигнала строки связи, не нужный при пакетном изменении."""
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        if getattr(_bulk, 'active', False):
+            return None
+        return handler(*args, **kwargs)
+    return wrapper
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def catalog_row_changed(sender, **kwargs):
+    catalog_changed.send(sender=sender)
+
+
+@receiver(catalog_changed)
+def catalog_version_changed(sender, **kwargs):
+    """Новая версия справочника делает недействительным его кэш."""
+    bump_catalog_version(sender)
+    if sender is Ingredient:
+        ingredient_index.invalidate()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    """Изменение тегов меняет рецепт и его поисковый документ."""
+    if action == 'pre_clear':
+        # После очистки связей затронутые рецепты уже не найти.
+        instance._cleared_recipes = (
+            list(instance.recipes.values_list('pk', flat=True))
+            if reverse else [instance.pk]
+        )
+        return
+    if action == 'post_clear':
+        recipes = instance.__dict__.pop('_cleared_recipes', [])
+    elif action in ('post_add', 'post_remove'):
+        recipes = pk_set if reverse else [instance.pk]
+    else:
+        return
+    update_search_documents(recipes)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    """Название тега входит в поисковые документы его рецептов."""
+    if not created:
+        update_search_documents(instance.recipes.values('pk'))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    """Название ингредиента входит в поисковые документы рецептов."""
+    if not created:
+        update_search_documents(instance.recipes.values('recipes_id'))
+
+
+def _delta(signal, kwargs):
+    """+1 для созданной записи, -1 для удаленной, 0 для изменения."""
+    if signal is post_delete:
+        return -1
+    return 1 if kwargs.get('created') else 0
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        UserCounter.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, created, update_fields=None, **kwargs):
+    """Изменение данных автора делает недействительными ETag рецептов."""
+    if created:
+        return
+    if update_fields is None or AUTHOR_FIELDS.intersection(update_fields):
+        bump_catalog_version(User)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_counted(sender, instance, signal, **kwargs):
+    delta = _delta(signal, kwargs)
+    if delta:
+        change_user_counter([instance.author_id], 'recipes_count', delta)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    """Новое изображение рецепта отправляется на создание копий."""
+    if variants_outdated(instance):
+        schedule_variants(instance)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+@per_row
+def subscription_counted(sender, instance, signal, **kwargs):
+    delta = _delta(signal, kwargs)
+    if delta:
+        change_user_counter([instance.author_id], 'followers_count', delta)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_feed_added(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.user_id, [instance.author_id])
+        feed.sync_authors([instance.author_id])
+
+
+@receiver(post_delete, sender=Subscription)
+@per_row
+def subscription_feed_removed(sender, instance, **kwargs):
+    feed.remove(instance.user_id, [instance.author_id])
+    feed.sync_authors([instance.author_id])
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@per_row
+def favorite_counted(sender, instance, signal, **kwargs):
+    delta = _delta(signal, kwargs)
+    if delta:
+        change_recipe_counter([instance.recipe_id], 'favorites_count', delta)
+
+
+@receiver(post_save, sender=ShoppingCard)
+@receiver(post_delete, sender=ShoppingCard)
+@per_row
+def shopping_card_counted(sender, instance, signal, **kwargs):
+    delta = _delta(signal, kwargs)
+    if delta:
+        change_recipe_counter([instance.recipe_id], 'carts_count', delta)
+
+
+@receiver(post_save, sender=ShoppingCard)
+def shopping_card_added(sender, instance, created, **kwargs):
+    """В сводке пересчитываются только ингредиенты добавленного рецепта."""
+    if created:
+        refresh_cart_items(
+            [instance.user_id],
+            IngredientInRecipe.objects.filter(
+                recipes_id=instance.recipe_id).values('ingredients_id')
+        )
+
+
+@receiver(post_delete, sender=ShoppingCard)
+@per_row
+def shopping_card_removed(sender, instance, **kwargs):
+    """Сводки при удалении рецепта пересчитывает recipe_carts_deleted."""
+    if instance.recipe_id in getattr(_deleting, 'recipes', ()):
+        return
+    refresh_cart_items(
+        [instance.user_id],
+        IngredientInRecipe.objects.filter(
+            recipes_id=instance.recipe_id).values('ingredients_id')
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_carts_deleting(sender, instance, **kwargs):
+    """Корзины и ингредиенты рецепта запоминаются до каскадного удаления:
+    сводки пересчитываются один раз, только по ингредиентам рецепта."""
+    users = list(ShoppingCard.objects.filter(recipe=instance)
+                 .values_list('user_id', flat=True))
+    if not users:
+        return
+    instance._cart_refresh = (users, list(
+        IngredientInRecipe.objects.filter(recipes=instance)
+        .values_list('ingredients_id', flat=True)
+    ))
+    if not hasattr(_deleting, 'recipes'):
+        _deleting.recipes = set()
+    _deleting.recipes.add(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_carts_deleted(sender, instance, **kwargs):
+    refresh = instance.__dict__.pop('_cart_refresh', None)
+    if refresh is None:
+        return
+    _deleting.recipes.discard(instance.pk)
+    users, ingredients = refresh
+    if ingredients:
+        refresh_cart_items(users, ingredients)
+
+
+@receiver(relations_bulk_changed, sender=ShoppingCard)
+def shopping_cards_bulk_changed(sender, user, **kwargs):
+    refresh_cart_items([user.pk])
+
+
+@receiver(relations_bulk_changed, sender=Favorite)
+@receiver(relations_bulk_changed, sender=ShoppingCard)
+def recipe_relations_bulk_changed(sender, targets, **kwargs):
+    # Пересчет, а не сдвиг: при гонках часть строк могла не вставиться.
+    recount_recipe_counters(Recipe.objects.filter(pk__in=targets))
+
+
+@receiver(relations_bulk_changed, sender=Subscription)
+def subscriptions_bulk_changed(sender, targets, **kwargs):
+    recount_user_counters(User.objects.filter(pk__in=targets))
+
+
+@receiver(relations_bulk_changed, sender=Subscription)
+def subscriptions_feed_bulk_changed(sender, user, targets, created,
+                                    **kwargs):
+    # Регистрируется после пересчета счетчиков: популярность авторов
+    # оценивается по новым значениям.
+    if created:
+        feed.backfill(user.pk, targets)
+    else:
+        feed.remove(user.pk, targets)
+    feed.sync_authors(targets)
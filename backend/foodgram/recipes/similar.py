@@ -0,0 +1,111 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from recipes.models import IngredientInRecipe, Recipe, SimilarRecipe
+
+
+def recipe_features():
+    """Признаки рецептов: {id рецепта: множество признаков}.
+
+    Признак - ингредиент или тег рецепта. Количество ингредиента не
+    учитывается: единицы измерения у ингредиентов разные.
+    """
+    features = defaultdict(set)
+    for recipe_id, ingredient_id in IngredientInRecipe.objects.values_list(
+            'recipes_id', 'ingredients_id').iterator():
+        features[recipe_id].add(('ingredient', ingredient_id))
+    for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id').iterator():
+        features[recipe_id].add(('tag', tag_id))
+    return features
+
+
+class SimilarityMatrix:
+    """Разреженная матрица 'рецепт x признак' с весами idf.
+
+    Строки нормированы, поэтому косинусное сходство двух рецептов равно
+    скалярному произведению строк. Столбцы хранятся списками пар
+    (рецепт, вес): сходство рецепта накапливается только по рецептам
+    с общими признаками, редкие признаки весят больше частых.
+    """
+
+    def __init__(self, features):
+        total = len(features)
+        frequency = Counter(
+            feature for row in features.values() for feature in row)
+        self.rows = {}
+        self.columns = defaultdict(list)
+        for pk, row in features.items():
+            weights = {feature: math.log(1 + total / frequency[feature])
+                       for feature in row}
+            norm = math.sqrt(sum(weight ** 2 for weight in weights.values()))
+            if not norm:
+                continue
+            self.rows[pk] = {feature: weight / norm
+                             for feature, weight in weights.items()}
+            for feature, weight in self.rows[pk].items():
+                self.columns[feature].append((pk, weight))
+
+    def related(self, recipe_ids):
+        """Рецепты, у которых есть общие признаки с recipe_ids."""
+        related = set()
+        for pk in recipe_ids:
+            for feature in self.rows.get(pk, ()):
+                related.update(other for other, _ in self.columns[feature])
+        return related
+
+    def neighbours(self, pk, limit):
+        """limit пар (id рецепта, сходство) по убыванию сходства."""
+        scores = defaultdict(float)
+        for feature, weight in self.rows.get(pk, {}).items():
+            for other, other_weight in self.columns[feature]:
+                scores[other] += weight * other_weight
+        scores.pop(pk, None)
+        return heapq.nlargest(limit, scores.items(),
+                              key=lambda item: (item[1], item[0]))
+
+
+def refresh_similar_recipes(full=False, batch_size=500):
+    """Пересчет похожих рецептов, возвращает число пересчитанных.
+
+    По умолчанию пересчитываются рецепты, измененные после прошлого
+    расчета, рецепты с общими с ними признаками и рецепты, у которых
+    они были в похожих. Веса признаков при этом у остальных рецептов
+    не обновляются, после удаления рецептов и больших изменений
+    справочника нужен полный пересчет (full=True).
+    """
+    started = timezone.now()
+    since = None
+    if not full:
+        since = SimilarRecipe.objects.aggregate(
+            last=Max('computed_at'))['last']
+    features = recipe_features()
+    matrix = SimilarityMatrix(features)
+    if since is None:
+        targets = set(Recipe.objects.values_list('pk', flat=True))
+    else:
+        changed = set(Recipe.objects.filter(
+            updated_at__gte=since).values_list('pk', flat=True))
+        targets = changed | matrix.related(changed) | set(
+            SimilarRecipe.objects.filter(similar_id__in=changed)
+            .values_list('recipe_id', flat=True)
+        )
+    targets = sorted(targets)
+    for start in range(0, len(targets), batch_size):
+        batch = targets[start:start + batch_size]
+        rows = [
+            SimilarRecipe(recipe_id=pk, similar_id=other, score=score,
+                          computed_at=started)
+            for pk in batch
+            for other, score in matrix.neighbours(
+                pk, settings.SIMILAR_RECIPES_LIMIT)
+        ]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+            SimilarRecipe.objects.bulk_create(rows)
+    return len(targets)